@@ -1,16 +1,24 @@
-import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth import get_user_model
+from django.utils import timezone
 from .models import ChatMessage, ChatRoom
+from . import membership, presence, unread, write_behind
+from .ids import anext_message_id
 from notifications.models import Notification
+from room_rental.wire import InvalidFrame, WireProtocolMixin
 
-User = get_user_model()
-
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(WireProtocolMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
-        self.room_group_name = f'chat_{self.room_id}'
+        self.room_group_name = membership.group_name(self.room_id)
+        
+        # Members only; the set is kept for the connection's lifetime and
+        # refreshed by membership_changed events
+        user = self.scope.get('user')
+        self.members = await self.load_members()
+        if user is None or not user.is_authenticated or user.id not in self.members:
+            await self.close()
+            return
         
         # Join room group
         await self.channel_layer.group_add(
@@ -18,7 +26,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        await self.accept()
+        await self.accept_wire()
+        self.presence = presence.get_service()
+        self.presence_view = presence.RoomView()
+        self.presence.join(self.room_id, user.id, self.channel_name)
     
     async def disconnect(self, close_code):
         # Leave room group
@@ -26,17 +37,36 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        if hasattr(self, 'presence'):
+            self.presence.leave(self.room_id, self.channel_name)
+        if write_behind.enabled():
+            # Don't leave this connection's last messages waiting for the timer
+            await write_behind.get_buffer().flush()
     
-    async def receive(self, text_data):
-        data = json.loads(text_data)
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = self.decode_frame(text_data, bytes_data)
+        except InvalidFrame:
+            # Unreadable, not an object, or too large once inflated
+            await self.close(code=1007)
+            return
         action = data.get('action')
 
+        # Presence: memory only, broadcast in coalesced batches (chat.presence)
+        if action == 'heartbeat':
+            self.presence.heartbeat(self.room_id, self.scope['user'].id, self.channel_name)
+            return
+        if action == 'typing':
+            self.presence.typing(self.room_id, self.scope['user'].id, self.channel_name,
+                                 data.get('typing', True) is not False)
+            return
+
         # Read receipt handler
         if action == 'read':
             message_id = data.get('message_id')
             if message_id:
                 # Mark as read if this user is the receiver
-                updated = await self.mark_message_read(message_id, self.scope['user'].id)
+                updated = await self.on_message(message_id, self.mark_message_read, self.scope['user'].id)
                 if updated:
                     await self.channel_layer.group_send(
                         self.room_group_name,
@@ -48,13 +78,33 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     )
             return
 
+        # Read everything up to a message: one UPDATE, one watermark event
+        if action == 'read_up_to':
+            message_id = data.get('message_id')
+            if isinstance(message_id, int):
+                result = await self.on_message(message_id, self.mark_read_up_to, self.scope['user'].id)
+                updated, mark = result or (0, None)
+                if updated:
+                    await self.channel_layer.group_send(
+                        self.room_group_name,
+                        {
+                            'type': 'read_watermark',
+                            'up_to': message_id,
+                            'up_to_timestamp': mark[0].isoformat(),
+                            'reader_id': self.scope['user'].id,
+                        }
+                    )
+            return
+
         # Edit message
         if action == 'edit':
             message_id = data.get('message_id')
             new_text = data.get('message', '').strip()
             if message_id and new_text:
-                updated = await self.edit_message(message_id, self.scope['user'].id, new_text)
-                if updated:
+                updated = await self.on_message(message_id, self.edit_message, self.scope['user'].id, new_text)
+                if not updated:
+                    await self.reject(action, message_id)
+                else:
                     await self.channel_layer.group_send(
                         self.room_group_name,
                         {
@@ -69,8 +119,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if action == 'delete':
             message_id = data.get('message_id')
             if message_id:
-                updated = await self.delete_message(message_id, self.scope['user'].id)
-                if updated:
+                updated = await self.on_message(message_id, self.delete_message, self.scope['user'].id)
+                if not updated:
+                    await self.reject(action, message_id)
+                else:
                     await self.channel_layer.group_send(
                         self.room_group_name,
                         {
@@ -80,9 +132,15 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     )
             return
 
-        # Default: send chat message
+        # Default: send chat message. The receiver is the room's other member,
+        # whatever `receiver_id` the client sent
         message = data['message']
-        receiver_id = data['receiver_id']
+        receiver_id = membership.receiver_for(self.members, self.scope['user'].id)
+        self.presence.typing(self.room_id, self.scope['user'].id, self.channel_name, False)
+
+        if write_behind.enabled():
+            await self.send_write_behind(message, receiver_id)
+            return
 
         # Save message to database
         chat_message = await self.save_message(
@@ -106,78 +164,161 @@ class ChatConsumer(AsyncWebsocketConsumer):
         # Notify receiver
         await self.create_and_send_notification(receiver_id, message, chat_message)
     
+    async def send_write_behind(self, message, receiver_id):
+        # Broadcast now; the row is written with the next batch and acked then
+        sender = self.scope['user']
+        entry = {
+            'id': await anext_message_id(),
+            'timestamp': timezone.now(),
+            'sender_id': sender.id,
+            'sender_username': sender.username,
+            'receiver_id': receiver_id,
+            'room_id': int(self.room_id),
+            'message': message,
+            'channel_name': self.channel_name,
+        }
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'chat_message',
+                'message': message,
+                'sender_id': sender.id,
+                'sender_username': sender.username,
+                'timestamp': entry['timestamp'].isoformat(),
+                'message_id': entry['id']
+            }
+        )
+        write_behind.get_buffer().add(entry)
+
+    async def on_message(self, message_id, operation, *args):
+        """
+        await operation(message_id, *args), a database method that returns None
+        when the message doesn't exist. With write-behind a client can act on a
+        message before its row is written; the operation then runs once it is.
+        """
+        if write_behind.enabled() and write_behind.get_buffer().holds(message_id):
+            await write_behind.get_buffer().flush()
+        result = await operation(message_id, *args)
+        if result is None and write_behind.enabled() and await write_behind.stored(message_id):
+            result = await operation(message_id, *args)
+        return result
+
+    async def reject(self, action, message_id):
+        # Only the client that asked needs to know
+        await self.send_event({'event': 'rejected', 'action': action, 'message_id': message_id})
+
+    @database_sync_to_async
+    def load_members(self):
+        return membership.load(self.room_id)
+
+    async def presence_update(self, event):
+        if event['hello'] and event['origin'] != self.presence.origin:
+            # Someone joined through another process; tell them who is here
+            self.presence.reannounce(self.room_id)
+        # Only what changed across all processes, not this one origin's view
+        changes = self.presence_view.apply(event)
+        if changes:
+            await self.send_event({'event': 'presence', **changes})
+
+    async def membership_changed(self, event):
+        self.members = await self.load_members()
+        if self.scope['user'].id not in self.members:
+            await self.close()
+
     async def chat_message(self, event):
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'message': event['message'],
             'sender_id': event['sender_id'],
             'sender_username': event['sender_username'],
             'timestamp': event['timestamp'],
             'message_id': event['message_id']
-        }))
+        })
+
+    async def message_ack(self, event):
+        # Write-behind: these messages are now stored
+        await self.send_event({
+            'event': 'ack',
+            'message_ids': event['message_ids'],
+        })
+
+    async def persist_failed(self, event):
+        await self.send_event({
+            'event': 'persist_failed',
+            'message_ids': event['message_ids'],
+        })
 
     async def read_receipt(self, event):
         # Broadcast read receipt to both participants in room
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'event': 'read',
             'message_id': event['message_id'],
             'reader_id': event['reader_id'],
-        }))
+        })
+
+    async def read_watermark(self, event):
+        # Every message to the reader sent up to (up_to_timestamp, up_to) is now read
+        await self.send_event({
+            'event': 'read_up_to',
+            'up_to': event['up_to'],
+            'up_to_timestamp': event['up_to_timestamp'],
+            'reader_id': event['reader_id'],
+        })
 
     async def message_edited(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'event': 'edited',
             'message_id': event['message_id'],
             'message': event['message'],
-        }))
+        })
 
     async def message_deleted(self, event):
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'event': 'deleted',
             'message_id': event['message_id'],
-        }))
+        })
     
     @database_sync_to_async
     def save_message(self, sender, receiver_id, message):
-        receiver = User.objects.get(id=receiver_id)
+        # Membership was checked at connect; only writes from here on
+        room_id = int(self.room_id)
         chat_message = ChatMessage.objects.create(
             sender=sender,
-            receiver=receiver,
+            receiver_id=receiver_id,
+            room_id=room_id,
             message=message
         )
-        
-        # Update or create chat room
-        chat_room = ChatRoom.objects.filter(
-            participants=sender
-        ).filter(
-            participants=receiver
-        ).first()
-        
-        if not chat_room:
-            chat_room = ChatRoom.objects.create()
-            chat_room.participants.add(sender, receiver)
-        
-        chat_room.last_message = chat_message
-        chat_room.save()
+        unread.message_added(room_id, receiver_id, sender.id, chat_message.timestamp)
+        ChatRoom.objects.filter(id=room_id).update(last_message=chat_message)
         
         return chat_message
 
     @database_sync_to_async
     def mark_message_read(self, message_id, reader_id):
         try:
-            msg = ChatMessage.objects.select_related('receiver').get(id=message_id)
+            # Only messages of this room; membership was checked for it at connect
+            msg = ChatMessage.objects.select_related('receiver').get(id=message_id, room_id=self.room_id)
             if msg.receiver_id == reader_id and not msg.is_read:
                 msg.is_read = True
                 msg.save(update_fields=['is_read'])
+                if not msg.is_deleted and msg.sender_id != reader_id:
+                    unread.messages_read(msg.room_id, reader_id)
                 return True
         except ChatMessage.DoesNotExist:
-            return False
+            return None
         return False
 
+    @database_sync_to_async
+    def mark_read_up_to(self, message_id, reader_id):
+        mark = unread.watermark(int(self.room_id), message_id)
+        if mark is None:
+            return None
+        return unread.mark_read_up_to(int(self.room_id), reader_id, mark), mark
+
     @database_sync_to_async
     def edit_message(self, message_id, editor_id, new_text):
         try:
-            msg = ChatMessage.objects.get(id=message_id)
+            msg = ChatMessage.objects.get(id=message_id, room_id=self.room_id)
             if msg.sender_id != editor_id:
                 return False
             if msg.is_deleted:
@@ -189,12 +330,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
             msg.save(update_fields=['message', 'is_edited', 'edited_at'])
             return True
         except ChatMessage.DoesNotExist:
-            return False
+            return None
 
     @database_sync_to_async
     def delete_message(self, message_id, deleter_id):
         try:
-            msg = ChatMessage.objects.get(id=message_id)
+            msg = ChatMessage.objects.get(id=message_id, room_id=self.room_id)
             if msg.sender_id != deleter_id:
                 return False
             if msg.is_deleted:
@@ -205,16 +346,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
             # Optionally redact content; keep placeholder
             msg.message = 'This message was deleted'
             msg.save(update_fields=['is_deleted', 'deleted_at', 'message'])
+            if not msg.is_read and msg.receiver_id != msg.sender_id:
+                # Deleted messages no longer count as unread
+                unread.messages_read(msg.room_id, msg.receiver_id)
             return True
         except ChatMessage.DoesNotExist:
-            return False
+            return None
 
     @database_sync_to_async
     def create_notification(self, receiver_id, message, chat_message):
-        receiver = User.objects.get(id=receiver_id)
         notif = Notification.objects.create(
-            user=receiver,
-            title=f"New message from {self.scope['user'].username}",
+            user_id=receiver_id,
+            title=write_behind.notification_title(self.scope['user'].username),
             message=message,
             data={'room_id': int(self.room_id), 'sender_id': self.scope['user'].id, 'message_id': chat_message.id}
         )
@@ -0,0 +1,63 @@
+"""
+ChatMessage ids assigned by the application rather than the database.
+
+Write-behind persistence (chat.write_behind) broadcasts a message before its
+row exists, so the id has to be known up front. While CHAT_WRITE_BEHIND is
+on, every ChatMessage insert therefore takes its id from here, and
+autoincrement never hands out an id that a buffered message already owns;
+with it off, the database assigns ids as usual. Each process reserves
+CHAT_MESSAGE_ID_BLOCK ids at a time from the ChatMessageSequence row, so the
+counter is touched once per block, and every block starts above the highest
+stored id. Ids are unique everywhere and increase within a process, but
+blocks held by different processes interleave: order messages by
+(timestamp, id), never by id alone.
+
+MySQL and SQLite move autoincrement past explicitly inserted ids. On
+PostgreSQL, run `manage.py sqlsequencereset chat` after turning write-behind
+off.
+"""
+import threading
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .models import ChatMessageSequence
+
+_lock = threading.Lock()
+_next = 0
+_end = 0
+
+
+def _take_cached():
+    global _next
+    with _lock:
+        if _next < _end:
+            value = _next
+            _next += 1
+            return value
+    return None
+
+
+def next_message_id():
+    global _next, _end
+    if connection.in_atomic_block:
+        # A rollback would return the rest of a cached block to the counter
+        # while this process kept handing it out; reserve exactly one
+        return ChatMessageSequence.reserve(1)
+    value = _take_cached()
+    if value is not None:
+        return value
+    block = getattr(settings, 'CHAT_MESSAGE_ID_BLOCK', 20)
+    start = ChatMessageSequence.reserve(block)
+    with _lock:
+        _next, _end = start + 1, start + block
+    return start
+
+
+async def anext_message_id():
+    """next_message_id() for async callers; only goes to the database when the block runs out."""
+    value = _take_cached()
+    if value is None:
+        value = await database_sync_to_async(next_message_id)()
+    return value
@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+
+from chat.consumers import ChatConsumer
+from chat.models import ChatParticipant, ChatRoom
+
+User = get_user_model()
+
+
+@database_sync_to_async
+def _start_capture():
+    # Consumers run their database calls on this same thread
+    connection.force_debug_cursor = True
+    reset_queries()
+
+
+@database_sync_to_async
+def _take_queries():
+    queries = [query['sql'] for query in connection.queries]
+    reset_queries()
+    return queries
+
+
+class Command(BaseCommand):
+    help = 'Count the queries ChatConsumer makes to authorize a connection and each chat message'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+
+    def handle(self, *args, **options):
+        # Runs in autocommit like a live consumer; the synthetic users and
+        # everything hanging off them are deleted afterwards
+        users = [User.objects.create_user(username=f'__chat_membership_{name}__', password=None)
+                 for name in ('a', 'b', 'outsider')]
+        try:
+            room, _ = ChatRoom.objects.get_or_create_for_pair(users[0].id, users[1].id)
+            asyncio.run(self._run(room, *users, options['messages']))
+        finally:
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def _connect(self, room, user):
+        return ApplicationCommunicator(ChatConsumer.as_asgi(), {
+            'type': 'websocket',
+            'path': f'/ws/chat/{room.id}/',
+            'headers': [],
+            'query_string': b'',
+            'subprotocols': [],
+            'user': user,
+            'url_route': {'args': (), 'kwargs': {'room_id': str(room.id)}},
+        })
+
+    async def _run(self, room, sender, receiver, outsider, count):
+        await _start_capture()
+
+        rejected = self._connect(room, outsider)
+        await rejected.send_input({'type': 'websocket.connect'})
+        if (await rejected.receive_output(5))['type'] != 'websocket.close':
+            raise CommandError('A non-member was allowed to connect')
+        await rejected.wait(5)
+        await _take_queries()
+
+        communicator = self._connect(room, sender)
+        await communicator.send_input({'type': 'websocket.connect'})
+        if (await communicator.receive_output(5))['type'] != 'websocket.accept':
+            raise CommandError('A member was refused')
+        connect_queries = await _take_queries()
+
+        for i in range(count):
+            # receiver_id is deliberately wrong: the consumer derives the receiver itself
+            await communicator.send_input({'type': 'websocket.receive',
+                                           'text': json.dumps({'message': f'membership {i}', 'receiver_id': 0})})
+            await communicator.receive_output(5)
+        await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await communicator.wait(5)
+        message_queries = await _take_queries()
+
+        auth_tables = (User._meta.db_table, ChatParticipant._meta.db_table)
+        lookups = [sql for sql in message_queries
+                   if sql.lstrip().upper().startswith('SELECT') and any(table in sql for table in auth_tables)]
+        stored = await database_sync_to_async(room.messages.filter(receiver=receiver).count)()
+
+        self.stdout.write(f'connect: {len(connect_queries)} queries (membership loaded once)')
+        self.stdout.write(f'{count} messages: {len(message_queries)} queries, '
+                          f'{len(message_queries) / count:.2f} per message')
+        self.stdout.write(f'membership/user lookups per message: {len(lookups) / count:.2f}')
+        self.stdout.write(f'stored for the derived receiver: {stored}/{count}')
@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat import write_behind
+from chat.consumers import ChatConsumer
+from chat.ids import next_message_id
+from chat.models import ChatRoom
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare per-message latency and throughput of direct and write-behind chat persistence'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--batch', type=int, default=settings.CHAT_WRITE_BEHIND_BATCH)
+
+    def handle(self, *args, **options):
+        # Runs in autocommit like a live consumer; the synthetic users and
+        # everything hanging off them are deleted afterwards
+        sender = User.objects.create_user(username='__chat_benchmark_a__', password=None)
+        receiver = User.objects.create_user(username='__chat_benchmark_b__', password=None)
+        try:
+            room, _ = ChatRoom.objects.get_or_create_for_pair(sender.id, receiver.id)
+            self._run(sender, receiver, room, options['messages'], options['batch'])
+        finally:
+            User.objects.filter(id__in=[sender.id, receiver.id]).delete()
+
+    def _run(self, sender, receiver, room, count, batch_size):
+        consumer = ChatConsumer()
+        consumer.scope = {'user': sender}
+        consumer.room_id = str(room.id)
+        # The synchronous bodies of the consumer's database_sync_to_async methods
+        save_message = ChatConsumer.__dict__['save_message'].func
+        create_notification = ChatConsumer.__dict__['create_notification'].func
+
+        # Direct: the receive handler waits on save_message before it can broadcast,
+        # then on the notification before it reads the next frame
+        before_broadcast = []
+        started = time.perf_counter()
+        for i in range(count):
+            start = time.perf_counter()
+            chat_message = save_message(consumer, sender, receiver.id, f'direct {i}')
+            before_broadcast.append((time.perf_counter() - start) * 1000)
+            create_notification(consumer, receiver.id, f'direct {i}', chat_message)
+        direct_total = time.perf_counter() - started
+
+        # Write-behind: the handler only takes an id before broadcasting; rows are
+        # written a batch at a time, and acks follow each batch
+        accept = []
+        flushes = []
+        batch = []
+        started = time.perf_counter()
+        for i in range(count):
+            start = time.perf_counter()
+            batch.append({
+                'id': next_message_id(),
+                'timestamp': timezone.now(),
+                'sender_id': sender.id,
+                'sender_username': sender.username,
+                'receiver_id': receiver.id,
+                'room_id': room.id,
+                'message': f'write-behind {i}',
+            })
+            accept.append((time.perf_counter() - start) * 1000)
+            if len(batch) >= batch_size or i == count - 1:
+                start = time.perf_counter()
+                write_behind.persist(batch)
+                flushes.append((time.perf_counter() - start) * 1000)
+                batch = []
+        write_behind_total = time.perf_counter() - started
+
+        self.stdout.write(f'{count} messages, write-behind batches of {batch_size}; latency is time until broadcast')
+        self.stdout.write(f"{'path':<14} {'p50 ms':>9} {'p99 ms':>9} {'msg/s':>10}")
+        for label, samples, total in (('direct', before_broadcast, direct_total),
+                                      ('write-behind', accept, write_behind_total)):
+            self.stdout.write(
+                f'{label:<14} {statistics.median(samples):>9.3f} {_p99(samples):>9.3f} {count / total:>10.0f}'
+            )
+        self.stdout.write(
+            f'write-behind flush: p50 {statistics.median(flushes):.2f} ms per batch, '
+            f'ack after at most CHAT_WRITE_BEHIND_DELAY_MS ({settings.CHAT_WRITE_BEHIND_DELAY_MS} ms) plus one flush'
+        )
+
+
+def _p99(samples):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
@@ -0,0 +1,91 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from chat.models import ChatMessage, ChatMessageSequence
+from chat import search
+from room_rental.benchmarks import time_ms
+from room_rental.fixtures import rolled_back
+
+User = get_user_model()
+
+WORDS = [
+    'room', 'rent', 'deposit', 'available', 'visit', 'tomorrow', 'evening', 'balcony', 'kitchen', 'shared',
+    'furnished', 'metro', 'station', 'parking', 'water', 'electricity', 'bill', 'included', 'month', 'lease',
+    'agreement', 'owner', 'tenant', 'key', 'photos', 'location', 'landmark', 'college', 'office', 'quiet',
+    'friendly', 'pets', 'allowed', 'guests', 'weekend', 'maintenance', 'lift', 'security', 'wifi', 'laundry',
+]
+QUERIES = ['room', 'deposit', 'balcony kitchen', 'metro station parking', 'sunroof']
+# Share of messages that mention the rare word
+RARE_WORD = 'sunroof'
+RARE_RATE = 0.002
+
+# Synthetic conversations in the background volume
+BACKGROUND_USERS = 200
+
+
+class Command(BaseCommand):
+    help = "Time one user's chat search while the total message volume grows, against a scoped icontains"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--own', type=int, default=10000, help="Messages in the searching user's conversations")
+        parser.add_argument('--volumes', type=int, nargs='+', default=[0, 50000, 200000],
+                            help="Other users' messages to measure at, cumulative")
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Synthetic rows only exist for the duration of the benchmark
+        with rolled_back():
+            user, partners = self._users('__chat_search_benchmark_', 20)
+            _, others = self._users('__chat_search_background_', BACKGROUND_USERS)
+            self._messages(options['own'], [(user.id, partner.id) for partner in partners], rng)
+            self.stdout.write(f"{'volume':>8} {'query':<24} {'path':<10} {'p50 ms':>8} {'p95 ms':>8} {'hits':>6}")
+            created = 0
+            for volume in sorted(options['volumes']):
+                pairs = [tuple(rng.sample(others, 2)) for _ in range(BACKGROUND_USERS)]
+                self._messages(volume - created, [(low.id, high.id) for low, high in pairs], rng)
+                created = max(created, volume)
+                self._run(user, created, options['repeat'], options['page_size'])
+
+    def _users(self, prefix, count):
+        User.objects.bulk_create([User(username=f'{prefix}{i}__') for i in range(count + 1)])
+        users = list(User.objects.filter(username__startswith=prefix).order_by('id'))
+        return users[0], users[1:]
+
+    def _messages(self, count, pairs, rng):
+        batch_size = 2000
+        for offset in range(0, max(count, 0), batch_size):
+            size = min(batch_size, count - offset)
+            first_id = ChatMessageSequence.reserve(size)
+            messages = []
+            for i in range(size):
+                sender_id, receiver_id = rng.choice(pairs)
+                if rng.random() < 0.5:
+                    sender_id, receiver_id = receiver_id, sender_id
+                words = rng.choices(WORDS, k=10)
+                if rng.random() < RARE_RATE:
+                    words.append(RARE_WORD)
+                text = ' '.join(words)
+                messages.append(ChatMessage(id=first_id + i, sender_id=sender_id, receiver_id=receiver_id, message=text))
+            ChatMessage.objects.bulk_create(messages)
+            search.index_messages(messages, created=True)
+
+    def _run(self, user, volume, repeat, page_size):
+        mine = ChatMessage.objects.filter(Q(sender_id=user.id) | Q(receiver_id=user.id), is_deleted=False)
+        for query in QUERIES:
+            # What a search without the index has to do: every word, in every message of the user's
+            icontains = mine
+            for term in search.query_terms(query):
+                icontains = icontains.filter(message__icontains=term)
+            paths = (
+                ('icontains', lambda: list(icontains.order_by('-id').values_list('id', flat=True)[:page_size])),
+                ('index', lambda: list(search.search(user.id, query).values_list('message_id', flat=True)[:page_size])),
+            )
+            for path, fn in paths:
+                p50, p95 = time_ms(fn, repeat)
+                self.stdout.write(f'{volume:>8} {query:<24} {path:<10} {p50:>8.2f} {p95:>8.2f} {len(fn()):>6}')
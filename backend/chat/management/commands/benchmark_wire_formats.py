@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from room_rental import wire
+
+LONG_MESSAGE = (
+    'Hi! Is the room still available from next month? I would like to know whether the rent includes '
+    'electricity and water, how many people share the kitchen, and whether guests are allowed on weekends. '
+) * 8
+
+
+def _events():
+    now = timezone.now().isoformat()
+    return {
+        'chat message': {'message': 'Is the room still available?', 'sender_id': 1042, 'sender_username': 'priya_s',
+                         'timestamp': now, 'message_id': 5839201},
+        'long chat message': {'message': LONG_MESSAGE, 'sender_id': 1042, 'sender_username': 'priya_s',
+                              'timestamp': now, 'message_id': 5839202},
+        'read receipt': {'event': 'read', 'message_id': 5839201, 'reader_id': 2077},
+        'read watermark': {'event': 'read_up_to', 'up_to': 5839201, 'up_to_timestamp': now, 'reader_id': 2077},
+        'write-behind ack': {'event': 'ack', 'message_ids': list(range(5839201, 5839211))},
+        'notification': {'id': 91234, 'title': 'New message from priya_s', 'message': 'Is the room still available?',
+                         'data': {'room_id': 318, 'sender_id': 1042, 'message_id': 5839201},
+                         'is_read': False, 'created_at': now},
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes per event and encoding CPU of the JSON and compact WebSocket wire formats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20000, help='Encodings timed per event and format')
+
+    def handle(self, *args, **options):
+        protocols = (wire.JSON, wire.MSGPACK, wire.MSGPACK_DEFLATE)
+        repeat = options['repeat']
+        self.stdout.write(f"{'event':<20}" + ''.join(f'{name:>16}' for name in ('json', 'msgpack', 'msgpack+deflate')))
+        for label, payload in _events().items():
+            cells = []
+            for protocol in protocols:
+                frame = wire.encode(payload, protocol)
+                size = len(frame.encode() if isinstance(frame, str) else frame)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    wire.encode(payload, protocol)
+                micros = (time.perf_counter() - start) / repeat * 1e6
+                cells.append(f'{size:>6} B {micros:>5.1f} us')
+            self.stdout.write(f'{label:<20}' + ''.join(f'{cell:>16}' for cell in cells))
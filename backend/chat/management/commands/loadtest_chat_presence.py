@@ -0,0 +1,179 @@
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import Counter
+
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from chat import presence
+from chat.consumers import ChatConsumer
+from chat.models import ChatParticipant, ChatRoom
+
+User = get_user_model()
+
+PREFIX = '__presence_load_'
+TICK = 0.05
+
+
+_executed = [0]
+
+
+def _count(execute, sql, params, many, context):
+    _executed[0] += 1
+    return execute(sql, params, many, context)
+
+
+@database_sync_to_async
+def _start_capture():
+    # Consumers run their database calls on this same thread. Counted rather
+    # than logged: connection.queries stops at 9000 entries
+    connection.execute_wrappers.append(_count)
+
+
+@database_sync_to_async
+def _take_queries():
+    count, _executed[0] = _executed[0], 0
+    return count
+
+
+class Command(BaseCommand):
+    help = 'Load test chat presence and typing with many concurrent in-process WebSocket connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10000, help='Two per room')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of steady-state traffic')
+        parser.add_argument('--typing', type=float, default=0.3, help='Fraction of connections typing')
+        parser.add_argument('--keystrokes', type=float, default=5.0, help='Typing frames per second per typist')
+        parser.add_argument('--heartbeat', type=float, default=5.0, help='Seconds between heartbeats')
+
+    def handle(self, *args, **options):
+        # Runs in autocommit like live consumers; the synthetic users and
+        # everything hanging off them are deleted afterwards
+        try:
+            rooms = self._populate(options['connections'] // 2)
+            asyncio.run(self._run(rooms, options))
+        finally:
+            self.stdout.write('Removing synthetic users...')
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+    def _populate(self, room_count):
+        User.objects.bulk_create([User(username=f'{PREFIX}{i}__') for i in range(room_count * 2)], batch_size=1000)
+        ids = sorted(User.objects.filter(username__startswith=PREFIX).values_list('id', flat=True))
+        pairs = list(zip(ids[::2], ids[1::2]))
+        ChatRoom.objects.bulk_create([ChatRoom(user_low_id=low, user_high_id=high) for low, high in pairs],
+                                     batch_size=1000)
+        rooms = list(ChatRoom.objects.filter(user_low_id__in=ids[::2]).values_list('id', 'user_low_id', 'user_high_id'))
+        ChatParticipant.objects.bulk_create([
+            ChatParticipant(room_id=room_id, user_id=user_id)
+            for room_id, low, high in rooms for user_id in (low, high)
+        ], batch_size=1000)
+        return rooms
+
+    def _communicator(self, room_id, user):
+        return ApplicationCommunicator(ChatConsumer.as_asgi(), {
+            'type': 'websocket',
+            'path': f'/ws/chat/{room_id}/',
+            'headers': [],
+            'query_string': b'',
+            'subprotocols': [],
+            'user': user,
+            'url_route': {'args': (), 'kwargs': {'room_id': str(room_id)}},
+        })
+
+    async def _run(self, rooms, options):
+        users = await database_sync_to_async(
+            lambda: User.objects.in_bulk([user_id for _, low, high in rooms for user_id in (low, high)])
+        )()
+        layer = get_channel_layer()
+        if isinstance(layer, InMemoryChannelLayer):
+            # The development layer scans every channel and group for expired
+            # messages on each receive and group_send, which is quadratic at
+            # this scale and would be all this test measured
+            layer._clean_expired = lambda: None
+            self.stdout.write('InMemoryChannelLayer: expiry scan disabled for the load test')
+        await _start_capture()
+
+        started = time.perf_counter()
+        connections = []
+        for room_id, low, high in rooms:
+            for user_id in (low, high):
+                communicator = self._communicator(room_id, users[user_id])
+                await communicator.send_input({'type': 'websocket.connect'})
+                connections.append((room_id, communicator))
+        for _, communicator in connections:
+            await communicator.receive_output(30)
+        connect_seconds = time.perf_counter() - started
+        connect_queries = await _take_queries()
+        self.stdout.write(f'{len(connections)} connections in {len(rooms)} rooms: '
+                          f'{connect_seconds:.1f} s, {connect_queries} queries to connect')
+
+        service = presence.get_service()
+        await self._drain(connections, Counter())
+        broadcasts_before = service.broadcasts
+
+        typists = set(random.sample(range(len(connections)), int(len(connections) * options['typing'])))
+        keystroke_chance = options['keystrokes'] * TICK
+        heartbeat_every = max(1, round(options['heartbeat'] / TICK))
+        typing_frame = json.dumps({'action': 'typing'})
+        heartbeat_frame = json.dumps({'action': 'heartbeat'})
+
+        frames_in = 0
+        received = Counter()
+        lags = []
+        tick = 0
+        begin = time.perf_counter()
+        deadline = begin + options['duration']
+        while time.perf_counter() < deadline:
+            for index, (_, communicator) in enumerate(connections):
+                if index in typists and random.random() < keystroke_chance:
+                    await communicator.send_input({'type': 'websocket.receive', 'text': typing_frame})
+                    frames_in += 1
+                elif index % heartbeat_every == tick % heartbeat_every:
+                    await communicator.send_input({'type': 'websocket.receive', 'text': heartbeat_frame})
+                    frames_in += 1
+            await self._drain(connections, received)
+            tick += 1
+            expected = begin + tick * TICK
+            await asyncio.sleep(max(0.0, expected - time.perf_counter()))
+            # How late the loop woke up for the next tick
+            lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+        elapsed = time.perf_counter() - begin
+        await asyncio.sleep(settings.CHAT_PRESENCE_INTERVAL_MS / 1000)
+        await self._drain(connections, received)
+        steady_queries = await _take_queries()
+        broadcasts = service.broadcasts - broadcasts_before
+
+        per_room = Counter()
+        for index, (room_id, _) in enumerate(connections):
+            per_room[room_id] = max(per_room[room_id], received[index])
+        ceiling = elapsed * 1000 / settings.CHAT_PRESENCE_INTERVAL_MS + 1
+
+        self.stdout.write(f'{elapsed:.1f} s steady state: {frames_in} typing/heartbeat frames in '
+                          f'({frames_in / elapsed:.0f}/s), {broadcasts} presence broadcasts '
+                          f'({broadcasts / elapsed:.0f}/s), {sum(received.values())} presence frames out')
+        self.stdout.write(f'frames in per broadcast: {frames_in / max(broadcasts, 1):.1f}')
+        self.stdout.write(f'busiest room: {max(per_room.values(), default=0)} broadcasts '
+                          f'(throttle allows {ceiling:.0f} at {settings.CHAT_PRESENCE_INTERVAL_MS} ms)')
+        self.stdout.write(f'database queries during steady state: {steady_queries}')
+        self.stdout.write(f'event loop lag per {TICK * 1000:.0f} ms tick: '
+                          f'p50 {statistics.median(lags):.1f} ms, max {max(lags):.1f} ms')
+
+        for _, communicator in connections:
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        for _, communicator in connections:
+            await communicator.wait(30)
+
+    async def _drain(self, connections, received):
+        for index, (_, communicator) in enumerate(connections):
+            queue = communicator.output_queue
+            while not queue.empty():
+                queue.get_nowait()
+                received[index] += 1
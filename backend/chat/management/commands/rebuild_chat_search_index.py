@@ -0,0 +1,16 @@
+from chat.models import ChatMessage
+from chat import search
+from room_rental.indexing import RebuildIndexCommand
+
+
+class Command(RebuildIndexCommand):
+    help = 'Rebuild the per-user chat history search index from scratch'
+    noun = 'messages'
+    index_name = 'Chat search index'
+    default_batch_size = 1000
+
+    def get_queryset(self):
+        return ChatMessage.objects.only('id', 'sender_id', 'receiver_id', 'message', 'timestamp', 'is_deleted')
+
+    def index(self, batch):
+        search.index_messages(batch)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from chat import unread
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-participant unread message counters from the messages table'
+
+    def handle(self, *args, **options):
+        fixed = unread.repair()
+        self.stdout.write(self.style.SUCCESS(f'Corrected {fixed} unread counters'))
@@ -0,0 +1,43 @@
+"""
+Room membership for ChatConsumer, read once per connection.
+
+A consumer loads the room's participant ids when it connects, refuses the
+connection unless its user is one of them, and answers every later frame
+from that set, so authorizing a message costs no queries. When a room's
+participants change, `membership_changed` goes to the room's group once the
+transaction commits (see chat.signals). Connected consumers then reload, and
+disconnect if their user is no longer a member.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .models import ChatParticipant
+
+
+def group_name(room_id):
+    return f'chat_{room_id}'
+
+
+def load(room_id):
+    """Ids of the users taking part in the room (empty if there is no such room)."""
+    if not str(room_id).isdigit():
+        return frozenset()
+    return frozenset(ChatParticipant.objects.filter(room_id=room_id).values_list('user_id', flat=True))
+
+
+def receiver_for(members, sender_id):
+    """The other participant of a two-person room; the sender in a room of one."""
+    others = [user_id for user_id in members if user_id != sender_id]
+    return min(others) if others else sender_id
+
+
+def changed(room_id):
+    """Have the room's connected consumers reload their membership after commit."""
+    transaction.on_commit(lambda: _broadcast_changed(room_id))
+
+
+def _broadcast_changed(room_id):
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        async_to_sync(channel_layer.group_send)(group_name(room_id), {'type': 'membership_changed'})
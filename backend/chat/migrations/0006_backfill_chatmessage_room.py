@@ -0,0 +1,56 @@
+from django.db import migrations
+from django.db.models import Max, Min
+
+BATCH_SIZE = 5000
+
+
+def backfill_message_room(apps, schema_editor):
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    Participant = ChatRoom.participants.through
+
+    members = {}
+    for room_id, user_id in Participant.objects.values_list('chatroom_id', 'user_id').iterator():
+        members.setdefault(room_id, set()).add(user_id)
+    # Participant pair -> room; duplicate rooms for a pair resolve to the oldest,
+    # and a one-participant room is a chat with oneself
+    rooms_by_pair = {}
+    for room_id in sorted(members):
+        if len(members[room_id]) in (1, 2):
+            rooms_by_pair.setdefault(frozenset(members[room_id]), room_id)
+    created = []
+
+    bounds = ChatMessage.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    # Per primary-key range, one UPDATE per conversation found in that range
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        batch = ChatMessage.objects.filter(id__gte=start, id__lt=start + BATCH_SIZE, room__isnull=True)
+        pairs = set(batch.values_list('sender_id', 'receiver_id').distinct())
+        for sender_id, receiver_id in pairs:
+            pair = frozenset((sender_id, receiver_id))
+            room_id = rooms_by_pair.get(pair)
+            if room_id is None:
+                # Messages of a pair that never opened a room would drop out of
+                # history; give them one, as ChatRoom.objects.get_or_create_for_pair would
+                room = ChatRoom.objects.create()
+                room.participants.add(*pair)
+                room_id = rooms_by_pair[pair] = room.id
+                created.append(room_id)
+            batch.filter(sender_id=sender_id, receiver_id=receiver_id).update(room_id=room_id)
+
+    for room_id in created:
+        latest = (ChatMessage.objects.filter(room_id=room_id).order_by('-timestamp', '-id')
+                  .values_list('id', flat=True).first())
+        ChatRoom.objects.filter(id=room_id).update(last_message_id=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_chatmessage_room'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_message_room, migrations.RunPython.noop),
+    ]
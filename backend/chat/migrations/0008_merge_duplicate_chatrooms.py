@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+def merge_duplicate_rooms(apps, schema_editor):
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    Notification = apps.get_model('notifications', 'Notification')
+    Participant = ChatRoom.participants.through
+
+    members = {}
+    for room_id, user_id in Participant.objects.values_list('chatroom_id', 'user_id').iterator():
+        members.setdefault(room_id, set()).add(user_id)
+
+    # Pair -> rooms, oldest first; a one-participant room is a chat with oneself
+    rooms_by_pair = {}
+    for room_id in sorted(members):
+        users = sorted(members[room_id])
+        if len(users) in (1, 2):
+            rooms_by_pair.setdefault((users[0], users[-1]), []).append(room_id)
+
+    for (low, high), room_ids in rooms_by_pair.items():
+        keeper, duplicates = room_ids[0], room_ids[1:]
+        if duplicates:
+            ChatMessage.objects.filter(room_id__in=duplicates).update(room_id=keeper)
+            for duplicate in duplicates:
+                # Notification links point at the surviving room
+                for notification in Notification.objects.filter(data__room_id=duplicate).only('id', 'data'):
+                    notification.data['room_id'] = keeper
+                    notification.save(update_fields=['data'])
+            ChatRoom.objects.filter(id__in=duplicates).delete()
+            latest = (ChatMessage.objects.filter(room_id=keeper).order_by('-timestamp', '-id')
+                      .values_list('id', flat=True).first())
+            ChatRoom.objects.filter(id=keeper).update(last_message_id=latest)
+        ChatRoom.objects.filter(id=keeper).update(user_low_id=low, user_high_id=high)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_chatroom_pair_key'),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rooms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_merge_duplicate_chatrooms'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='chatroom',
+            constraint=models.UniqueConstraint(fields=('user_low', 'user_high'), name='chat_room_unique_pair'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:55
+
+from django.db import migrations, models
+from django.db.models import Max
+import django.utils.timezone
+
+
+def seed_sequence(apps, schema_editor):
+    # Continue after the ids the database has handed out so far
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatMessageSequence = apps.get_model('chat', 'ChatMessageSequence')
+    last_id = ChatMessage.objects.aggregate(last=Max('id'))['last'] or 0
+    ChatMessageSequence.objects.create(pk=1, next_id=last_id + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_chatparticipant_unread_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatMessageSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(seed_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:58
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def backfill_last_activity(apps, schema_editor):
+    # Latest message of the room, or the room's creation for empty ones
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatParticipant = apps.get_model('chat', 'ChatParticipant')
+    latest = ChatMessage.objects.filter(room_id=OuterRef('room_id')).order_by('-timestamp').values('timestamp')[:1]
+    created = ChatRoom.objects.filter(id=OuterRef('room_id')).values('created_at')[:1]
+    ChatParticipant.objects.update(last_activity_at=Coalesce(Subquery(latest), Subquery(created)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_chatmessage_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatparticipant',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='chatparticipant',
+            index=models.Index(fields=['user', 'last_activity_at', 'room'], name='chat_member_activity_idx'),
+        ),
+        migrations.RunPython(backfill_last_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_message_timestamps(apps, schema_editor):
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatSearchTerm = apps.get_model('chat', 'ChatSearchTerm')
+    ChatSearchTerm.objects.update(
+        timestamp=Subquery(ChatMessage.objects.filter(id=OuterRef('message_id')).values('timestamp')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_chatsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsearchterm',
+            name='timestamp',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(copy_message_timestamps, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='chatsearchterm',
+            name='timestamp',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='chatsearchterm',
+            index=models.Index(fields=['user', 'term', 'timestamp', 'message'], name='chat_search_user_term_ts_idx'),
+        ),
+    ]
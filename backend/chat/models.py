@@ -1,11 +1,46 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce, Greatest
 from django.conf import settings
+from django.utils import timezone
+
+class ChatRoomQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """
+        Rooms `user` takes part in, annotated with their `unread_count` and
+        `last_activity_at` (one join), most recently active first.
+        """
+        return self.filter(memberships__user=user).annotate(
+            unread_count=models.F('memberships__unread_count'),
+            last_activity_at=models.F('memberships__last_activity_at'),
+        ).order_by('-last_activity_at', '-id')
+
+    def for_pair(self, user_a_id, user_b_id):
+        """The conversation between two users, by the indexed canonical pair key."""
+        low, high = sorted((user_a_id, user_b_id))
+        return self.filter(user_low_id=low, user_high_id=high)
+
+    def get_or_create_for_pair(self, user_a_id, user_b_id):
+        """Race-free: the unique pair key makes a concurrent creator's room win."""
+        room = self.for_pair(user_a_id, user_b_id).first()
+        if room is not None:
+            return room, False
+        low, high = sorted((user_a_id, user_b_id))
+        try:
+            with transaction.atomic():
+                room = self.create(user_low_id=low, user_high_id=high)
+                room.participants.add(low, high)
+            return room, True
+        except IntegrityError:
+            return self.for_pair(low, high).get(), False
 
 class ChatMessage(models.Model):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='received_messages')
+    # Conversation the message belongs to; history pages are read by (room, timestamp, id)
+    room = models.ForeignKey('ChatRoom', on_delete=models.CASCADE, null=True, blank=True, related_name='messages')
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the message is accepted, which may precede its insert (chat.write_behind)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     is_read = models.BooleanField(default=False)
     # Edit/Delete metadata
     is_edited = models.BooleanField(default=False)
@@ -15,15 +50,101 @@ class ChatMessage(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['room', 'timestamp', 'id'], name='chat_msg_room_ts_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username} to {self.receiver.username}: {self.message[:50]}"
 
+    def save(self, *args, **kwargs):
+        if self.pk is None and getattr(settings, 'CHAT_WRITE_BEHIND', False):
+            # Buffered messages own ids the table hasn't seen yet, so while
+            # write-behind is on every insert takes its id from chat.ids
+            from .ids import next_message_id
+            self.pk = next_message_id()
+            kwargs.setdefault('force_insert', True)
+        super().save(*args, **kwargs)
+
+class ChatMessageSequence(models.Model):
+    """Single-row counter from which processes reserve blocks of ChatMessage ids."""
+    next_id = models.BigIntegerField()
+
+    @classmethod
+    def reserve(cls, count):
+        """Reserve `count` consecutive ids above any stored message and return the first."""
+        # Autoincrement keeps inserting while write-behind is off; start past it
+        last_id = ChatMessage.objects.order_by('-id').values('id')[:1]
+        first = Greatest('next_id', Coalesce(models.Subquery(last_id), 0) + 1)
+        with transaction.atomic():
+            # The UPDATE locks the row until the read below commits
+            cls.objects.filter(pk=1).update(next_id=first + count)
+            return cls.objects.values_list('next_id', flat=True).get(pk=1) - count
+
 class ChatRoom(models.Model):
-    participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='chat_rooms')
+    participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='chat_rooms',
+                                          through='ChatParticipant')
+    # Canonical participant pair (lower user id first): one room per pair
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='+', editable=False)
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='+', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     last_message = models.ForeignKey(ChatMessage, on_delete=models.SET_NULL, null=True, blank=True, related_name='last_message_for_room')
+
+    objects = ChatRoomQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='chat_room_unique_pair'),
+        ]
     
     def __str__(self):
         participants_names = ", ".join([user.username for user in self.participants.all()])
         return f"Chat: {participants_names}"
+
+class ChatParticipant(models.Model):
+    """
+    Membership of a user in a ChatRoom (the `participants` through table),
+    carrying that user's unread message count for the room.
+    """
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, db_column='chatroom_id', related_name='memberships')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_memberships')
+    # Messages to this user in the room that are unread and not deleted (see chat.unread)
+    unread_count = models.PositiveIntegerField(default=0)
+    # Time of the room's latest message (or its creation); orders the user's inbox
+    last_activity_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # The table Django created for the plain many-to-many field
+        db_table = 'chat_chatroom_participants'
+        unique_together = ('room', 'user')
+        indexes = [
+            # A user's inbox, newest first, read backwards off one index range
+            models.Index(fields=['user', 'last_activity_at', 'room'], name='chat_member_activity_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in room {self.room_id}"
+
+class ChatSearchTerm(models.Model):
+    """
+    Posting in a user's chat history index, maintained by chat.search: one row
+    per (user, term, message) for both participants of every live message.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    term = models.CharField(max_length=64)
+    message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='search_terms')
+    # The message's timestamp, so hits are ordered without reading the messages
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        # Probes for the other terms of a query look up (user, term, message)
+        unique_together = ('user', 'term', 'message')
+        indexes = [
+            # A user's postings for a term, newest last, on one index range
+            models.Index(fields=['user', 'term', 'timestamp', 'message'], name='chat_search_user_term_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.term} ➜ {self.message_id}"
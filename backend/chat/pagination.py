@@ -0,0 +1,99 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(value, pk):
+    """Opaque token for a (datetime, id) keyset position."""
+    payload = json.dumps({'v': value.isoformat(), 'id': pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """The (datetime, id) of an encode_cursor() token; raises NotFound if it isn't one."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        value = parse_datetime(payload['v'])
+        pk = int(payload['id'])
+    except Exception:
+        raise NotFound('Invalid cursor')
+    if value is None:
+        raise NotFound('Invalid cursor')
+    return value, pk
+
+
+class InboxCursorPagination(BasePagination):
+    """
+    Keyset pagination of a user's chat rooms by (`last_activity_at`, id), newest
+    first, as annotated by ChatRoom.objects.for_user().
+
+    The cursor is an opaque base64 token holding the activity time and id of
+    the last room on the page, so each page reads one range of the
+    (user, last_activity_at, room) membership index. Like the room list's
+    pagination it is opt-in: without `cursor` or `page_size` the whole inbox is
+    returned.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+
+    def is_enabled(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_enabled(request):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            value, pk = decode_cursor(token)
+            queryset = queryset.filter(
+                Q(last_activity_at__lt=value) | Q(last_activity_at=value, id__lt=pk)
+            )
+
+        # Fetch one extra row to learn whether another page exists
+        rows = list(queryset.order_by('-last_activity_at', '-id')[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param,
+                                   encode_cursor(self.page[-1].last_activity_at, self.page[-1].pk))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
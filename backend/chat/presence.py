@@ -0,0 +1,233 @@
+"""
+Presence and typing state for chat rooms, kept in memory per worker process.
+
+A user is online in a room while one of their connections to it has sent
+a frame within CHAT_PRESENCE_TTL seconds. Joining counts, and so does a
+`heartbeat`. They are typing while their latest `typing` frame is less than
+CHAT_TYPING_TTL seconds old. Heartbeats and keystrokes only move expiry
+times in a dict; they never touch the database and never broadcast by
+themselves.
+
+Changes are broadcast to the room's group as one `presence_update` carrying
+only the users whose online or typing state changed. Broadcasts are
+throttled per room: the first change goes out at once, and later changes
+wait until CHAT_PRESENCE_INTERVAL_MS has passed since the previous
+broadcast. Any number of keystrokes, joins and expiries in that window
+become a single event.
+
+Each process only knows its own connections, so a join is broadcast with
+`hello`. Other processes answer by re-announcing the users they hold in
+that room (chat.consumers), and the newcomer sees the whole room. Every
+broadcast carries its process's `origin`, and each connection keeps what
+every origin last reported in a RoomView. A client hears that a user went
+offline or stopped typing only once no process reports them any more, so a
+user connected through two workers stays online when one connection closes.
+"""
+import asyncio
+import time
+import uuid
+import weakref
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from . import membership
+
+_services = weakref.WeakKeyDictionary()
+
+
+def get_service():
+    """The presence service for the running event loop (one per worker process)."""
+    loop = asyncio.get_running_loop()
+    service = _services.get(loop)
+    if service is None:
+        service = _services[loop] = PresenceService(
+            get_channel_layer(),
+            interval=getattr(settings, 'CHAT_PRESENCE_INTERVAL_MS', 500) / 1000,
+            presence_ttl=getattr(settings, 'CHAT_PRESENCE_TTL', 30),
+            typing_ttl=getattr(settings, 'CHAT_TYPING_TTL', 5),
+        )
+    return service
+
+
+class _RoomState:
+    __slots__ = ('connections', 'typing', 'sent_online', 'sent_typing', 'full', 'hello', 'last_sent', 'timer')
+
+    def __init__(self):
+        # channel name -> (user id, expiry)
+        self.connections = {}
+        # user id -> expiry
+        self.typing = {}
+        # Local users' state as last broadcast
+        self.sent_online = set()
+        self.sent_typing = set()
+        # Next broadcast carries every local user, not just changes
+        self.full = False
+        self.hello = False
+        self.last_sent = float('-inf')
+        self.timer = None
+
+    def online(self):
+        return {user_id for user_id, _ in self.connections.values()}
+
+    def idle(self):
+        return not self.connections and not self.typing and not self.sent_online and not self.sent_typing
+
+
+class PresenceService:
+    def __init__(self, channel_layer, interval, presence_ttl, typing_ttl):
+        self.channel_layer = channel_layer
+        self.interval = interval
+        self.presence_ttl = presence_ttl
+        self.typing_ttl = typing_ttl
+        # Tells this process's own hellos apart from other processes'
+        self.origin = uuid.uuid4().hex
+        self.rooms = {}
+        self.broadcasts = 0
+        self._sweeper = None
+        self._tasks = set()
+
+    def join(self, room_id, user_id, channel_name):
+        room = self._room(room_id)
+        room.connections[channel_name] = (user_id, time.monotonic() + self.presence_ttl)
+        room.full = True
+        room.hello = True
+        self._changed(room_id, room)
+
+    def leave(self, room_id, channel_name):
+        room = self.rooms.get(room_id)
+        if room is None or room.connections.pop(channel_name, None) is None:
+            return
+        online = room.online()
+        for user_id in [user_id for user_id in room.typing if user_id not in online]:
+            del room.typing[user_id]
+        self._changed(room_id, room)
+
+    def heartbeat(self, room_id, user_id, channel_name):
+        room = self._room(room_id)
+        known = channel_name in room.connections
+        room.connections[channel_name] = (user_id, time.monotonic() + self.presence_ttl)
+        if not known:
+            # Came back after expiring
+            self._changed(room_id, room)
+
+    def typing(self, room_id, user_id, channel_name, is_typing=True):
+        self.heartbeat(room_id, user_id, channel_name)
+        room = self.rooms[room_id]
+        if is_typing:
+            started = user_id not in room.typing
+            room.typing[user_id] = time.monotonic() + self.typing_ttl
+            if started:
+                self._changed(room_id, room)
+        elif room.typing.pop(user_id, None) is not None:
+            self._changed(room_id, room)
+
+    def reannounce(self, room_id):
+        """Another process's user joined: send this process's users in the room again."""
+        room = self.rooms.get(room_id)
+        if room is not None and room.connections:
+            room.full = True
+            self._changed(room_id, room)
+
+    def _room(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = _RoomState()
+        if self._sweeper is None:
+            self._sweeper = asyncio.ensure_future(self._sweep())
+        return room
+
+    def _changed(self, room_id, room):
+        if room.timer is not None:
+            # A broadcast is already due; it will pick this change up
+            return
+        delay = max(0.0, room.last_sent + self.interval - time.monotonic())
+        room.timer = asyncio.get_running_loop().call_later(delay, self._start_broadcast, room_id)
+
+    def _start_broadcast(self, room_id):
+        task = asyncio.ensure_future(self._broadcast(room_id))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _broadcast(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+        room.timer = None
+        online = room.online()
+        typing = set(room.typing)
+        if room.full:
+            came_online, came_typing = online, typing
+        else:
+            came_online, came_typing = online - room.sent_online, typing - room.sent_typing
+        went_offline = room.sent_online - online
+        stopped_typing = room.sent_typing - typing
+        hello = room.hello
+        room.sent_online, room.sent_typing = online, typing
+        room.full = room.hello = False
+        if came_online or came_typing or went_offline or stopped_typing or hello:
+            room.last_sent = time.monotonic()
+            self.broadcasts += 1
+            await self.channel_layer.group_send(membership.group_name(room_id), {
+                'type': 'presence_update',
+                'online': sorted(came_online),
+                'offline': sorted(went_offline),
+                'typing': sorted(came_typing),
+                'not_typing': sorted(stopped_typing),
+                'hello': hello,
+                'origin': self.origin,
+            })
+        if room.idle() and room.timer is None:
+            del self.rooms[room_id]
+
+    async def _sweep(self):
+        # Expire silent connections and stale typing once a second
+        while self.rooms:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for room_id, room in list(self.rooms.items()):
+                expired = [name for name, (_, expires) in room.connections.items() if expires <= now]
+                for channel_name in expired:
+                    del room.connections[channel_name]
+                online = room.online()
+                stale = [user_id for user_id, expires in room.typing.items() if expires <= now or user_id not in online]
+                for user_id in stale:
+                    del room.typing[user_id]
+                if expired or stale:
+                    self._changed(room_id, room)
+        self._sweeper = None
+
+
+class RoomView:
+    """One connection's picture of a room, merged from every process's presence updates."""
+
+    def __init__(self):
+        # origin -> (online user ids, typing user ids)
+        self.origins = {}
+
+    def _merged(self):
+        online, typing = set(), set()
+        for origin_online, origin_typing in self.origins.values():
+            online |= origin_online
+            typing |= origin_typing
+        return online, typing
+
+    def apply(self, event):
+        """Fold in a presence_update; returns the changes for the client, or None if there are none."""
+        online_before, typing_before = self._merged()
+        online, typing = self.origins.setdefault(event['origin'], (set(), set()))
+        online.difference_update(event['offline'])
+        online.update(event['online'])
+        typing.difference_update(event['not_typing'])
+        typing.update(event['typing'])
+        if not online and not typing:
+            del self.origins[event['origin']]
+        online_after, typing_after = self._merged()
+        changes = {
+            'online': sorted(online_after - online_before),
+            'offline': sorted(online_before - online_after),
+            'typing': sorted(typing_after - typing_before),
+            'not_typing': sorted(typing_before - typing_after),
+        }
+        return changes if any(changes.values()) else None
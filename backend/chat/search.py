@@ -0,0 +1,118 @@
+"""
+Per-user inverted index over chat history.
+
+Each live message is tokenized into ChatSearchTerm postings for both of its
+participants. A search reads only the requesting user's postings for the
+query terms, so its cost depends on how often that user used those words and
+not on how many messages the system holds. Postings are written when a
+message is created (see chat.signals; chat.write_behind indexes its bulk
+inserts itself), replaced when it is edited, dropped when it is soft-deleted
+and removed by the foreign key cascade when it is deleted outright.
+
+A message matches when it contains every query term. Hits come newest
+first by (timestamp, id); postings carry the message's timestamp so that
+order is read straight off the index.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import ChatSearchTerm
+
+MAX_QUERY_TERMS = 5
+# Characters of message text returned around the first match
+SNIPPET_LENGTH = 160
+
+MAX_TERM_LENGTH = ChatSearchTerm._meta.get_field('term').max_length
+
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from in is it of on or the to
+""".split())
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lower-case word tokens of `text`, without stop words or single characters."""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in _TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def build_postings(message):
+    """Unsaved postings for a saved message; none once it is deleted."""
+    if message.is_deleted:
+        return []
+    terms = set(tokenize(message.message))
+    return [
+        ChatSearchTerm(user_id=user_id, term=term, message_id=message.pk, timestamp=message.timestamp)
+        for user_id in {message.sender_id, message.receiver_id}
+        for term in terms
+    ]
+
+
+def index_messages(messages, created=False):
+    """
+    Replace the postings of a batch of saved messages. With `created`, the
+    messages are new and only need inserting.
+    """
+    messages = list(messages)
+    postings = [posting for message in messages for posting in build_postings(message)]
+    if created:
+        ChatSearchTerm.objects.bulk_create(postings, batch_size=1000)
+        return
+    with transaction.atomic():
+        ChatSearchTerm.objects.filter(message_id__in=[message.pk for message in messages]).delete()
+        ChatSearchTerm.objects.bulk_create(postings, batch_size=1000)
+
+
+def query_terms(query):
+    # Deduplicate while keeping order, then cap to bound the probes per hit
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def search(user_id, query, before=None):
+    """
+    Postings of `user_id` for the messages containing every term of `query`,
+    newest first and, if given, older than the (timestamp, message id)
+    `before`, with each message and its sender and receiver loaded in the
+    same query.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return ChatSearchTerm.objects.none()
+    # Walk one term's postings backwards and probe the others' (user, term,
+    # message) index per row; longer words tend to be the rarer ones
+    terms.sort(key=len, reverse=True)
+    postings = ChatSearchTerm.objects.filter(user_id=user_id, term=terms[0], message__is_deleted=False)
+    for term in terms[1:]:
+        postings = postings.filter(Exists(
+            ChatSearchTerm.objects.filter(user_id=user_id, term=term, message_id=OuterRef('message_id'))
+        ))
+    if before is not None:
+        timestamp, message_id = before
+        postings = postings.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, message_id__lt=message_id))
+    return postings.select_related('message__sender', 'message__receiver').order_by('-timestamp', '-message_id')
+
+
+def snippet(text, terms, length=SNIPPET_LENGTH):
+    """
+    Up to `length` characters of `text` around the first occurrence of any of
+    `terms` (marked '…' where cut), and the [start, end) offsets of every
+    occurrence within it.
+    """
+    matches = [match for match in _TOKEN_RE.finditer(text) if match.group().lower()[:MAX_TERM_LENGTH] in terms]
+    start = 0
+    if matches and len(text) > length:
+        # A little lead-in before the first match
+        start = max(0, min(matches[0].start() - length // 4, len(text) - length))
+    end = min(len(text), start + length)
+    prefix = '…' if start > 0 else ''
+    excerpt = prefix + text[start:end] + ('…' if end < len(text) else '')
+    shift = len(prefix) - start
+    highlights = [[match.start() + shift, match.end() + shift]
+                  for match in matches if match.start() >= start and match.end() <= end]
+    return excerpt, highlights
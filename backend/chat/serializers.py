@@ -14,8 +14,18 @@ class ChatMessageSerializer(serializers.ModelSerializer):
 class ChatRoomSerializer(serializers.ModelSerializer):
     participants = UserSerializer(many=True, read_only=True)
     last_message = ChatMessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
+    last_activity_at = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatRoom
-        fields = ('id', 'participants', 'created_at', 'last_message')
+        fields = ('id', 'participants', 'created_at', 'last_message', 'unread_count', 'last_activity_at')
         read_only_fields = ('id', 'created_at')
+    
+    def get_unread_count(self, obj):
+        # Annotated by ChatRoom.objects.for_user()
+        return getattr(obj, 'unread_count', None)
+    
+    def get_last_activity_at(self, obj):
+        value = getattr(obj, 'last_activity_at', None)
+        return serializers.DateTimeField().to_representation(value) if value else None
@@ -0,0 +1,41 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ChatMessage, ChatParticipant, ChatRoom
+from . import membership, search
+
+
+@receiver(post_save, sender=ChatMessage)
+def update_message_search_index(sender, instance, created, update_fields=None, **kwargs):
+    # Read receipts and other flag updates don't change what is searchable
+    if update_fields is not None and not {'message', 'is_deleted'} & set(update_fields):
+        return
+    search.index_messages([instance], created=created)
+
+
+@receiver(post_save, sender=ChatParticipant)
+@receiver(post_delete, sender=ChatParticipant)
+def participant_changed(sender, instance, created=True, update_fields=None, **kwargs):
+    # Counter and activity updates don't change who is in the room
+    if not created and update_fields is not None and not {'room', 'user'} & set(update_fields):
+        return
+    membership.changed(instance.room_id)
+
+
+@receiver(m2m_changed, sender=ChatRoom.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # user.chat_rooms.clear(): post_clear can no longer tell which rooms
+        instance._chat_rooms_before_clear = list(sender.objects.filter(user=instance).values_list('room_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        room_ids = [instance.pk]
+    elif action == 'post_clear':
+        room_ids = getattr(instance, '_chat_rooms_before_clear', [])
+    else:
+        # user.chat_rooms.add()/remove(): pk_set holds room ids
+        room_ids = pk_set
+    for room_id in room_ids:
+        membership.changed(room_id)
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+
+from rooms.tests import TEST_CACHES, QueryBudgetTestCase
+from .models import ChatMessage, ChatMessageSequence, ChatParticipant, ChatRoom
+from . import search
+
+User = get_user_model()
+
+# Conversations of the fixture user, each with a last message
+FIXTURE_PARTNERS = 30
+
+
+@override_settings(CACHES=TEST_CACHES, ROOM_RESPONSE_CACHE_ALIAS='room_responses')
+class ChatQueryBudgetTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password=None)
+        partners = [User.objects.create_user(username=f'partner{i}', password=None) for i in range(FIXTURE_PARTNERS)]
+        ChatRoom.objects.bulk_create([
+            ChatRoom(user_low_id=min(cls.user.id, partner.id), user_high_id=max(cls.user.id, partner.id))
+            for partner in partners
+        ])
+        chat_rooms = list(ChatRoom.objects.order_by('id'))
+        ChatParticipant.objects.bulk_create([
+            ChatParticipant(room=chat_room, user_id=member_id)
+            for chat_room in chat_rooms for member_id in (chat_room.user_low_id, chat_room.user_high_id)
+        ])
+        first_id = ChatMessageSequence.reserve(len(chat_rooms))
+        messages = [
+            ChatMessage(id=first_id + i, room=chat_room, sender=cls.user, message=f'Fixture message {i}',
+                        receiver_id=chat_room.user_high_id if chat_room.user_low_id == cls.user.id else chat_room.user_low_id)
+            for i, chat_room in enumerate(chat_rooms)
+        ]
+        ChatMessage.objects.bulk_create(messages)
+        search.index_messages(messages, created=True)
+        for chat_room, message in zip(chat_rooms, messages):
+            chat_room.last_message = message
+        ChatRoom.objects.bulk_update(chat_rooms, ['last_message'])
+
+    def test_room_list(self):
+        self.assertQueryBudget('/api/chat/rooms/', 2, user=self.user)
+
+    def test_room_list_paginated(self):
+        self.assertQueryBudget('/api/chat/rooms/?page_size=20', 2, user=self.user)
+
+    def test_search(self):
+        self.assertQueryBudget('/api/chat/search/?q=fixture+message', 1, user=self.user)
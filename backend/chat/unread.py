@@ -0,0 +1,101 @@
+"""
+Unread message counters and inbox activity kept on ChatParticipant rows.
+
+A message counts as unread for its receiver while `is_read` and `is_deleted`
+are both false. Counters change with single UPDATE statements evaluated by
+the database (no read-modify-write), so concurrent senders and readers never
+lose increments. `manage.py repair_chat_unread` recomputes them from the
+messages if they ever drift. The same UPDATE that counts a new message
+moves the room's `last_activity_at` forward for both participants.
+"""
+from django.db.models import Case, Count, DateTimeField, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ChatMessage, ChatParticipant
+
+
+def unread_q():
+    return Q(is_read=False, is_deleted=False)
+
+
+def message_added(room_id, receiver_id, sender_id, timestamp, count=1):
+    """Count `count` new messages to `receiver_id`, the latest sent at `timestamp`."""
+    unread_count = F('unread_count')
+    if receiver_id != sender_id:
+        unread_count = Case(
+            When(user_id=receiver_id, then=F('unread_count') + count),
+            default=F('unread_count'),
+            output_field=IntegerField(),
+        )
+    ChatParticipant.objects.filter(room_id=room_id).update(
+        unread_count=unread_count,
+        # Batches can land out of order; activity never moves backwards
+        last_activity_at=Greatest('last_activity_at', Value(timestamp, output_field=DateTimeField())),
+    )
+
+
+def messages_read(room_id, reader_id, count=1):
+    """Subtract `count` newly read (or deleted) messages, never going below zero."""
+    if count <= 0:
+        return
+    ChatParticipant.objects.filter(room_id=room_id, user_id=reader_id, unread_count__gt=0).update(
+        unread_count=Case(
+            When(unread_count__gt=count, then=F('unread_count') - count),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+
+
+def watermark(room_id, message_id=None):
+    """
+    The (timestamp, id) of a message in the room, or of its latest message
+    when `message_id` is None; None if there is no such message. Ids handed
+    out for write-behind (chat.ids) are not in time order across processes,
+    so read positions compare on the same key as the history index.
+    """
+    messages = ChatMessage.objects.filter(room_id=room_id)
+    if message_id is None:
+        messages = messages.order_by('-timestamp', '-id')
+    else:
+        messages = messages.filter(id=message_id)
+    return messages.values_list('timestamp', 'id').first()
+
+
+def mark_read_up_to(room_id, reader_id, up_to):
+    """
+    Mark every unread message to `reader_id` in the room at or before the
+    `up_to` watermark (see watermark()) as read, in one UPDATE, and take them
+    off the reader's counter. Returns how many messages changed.
+    """
+    timestamp, message_id = up_to
+    updated = ChatMessage.objects.filter(
+        Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lte=message_id),
+        unread_q(), room_id=room_id, receiver_id=reader_id,
+    ).exclude(sender_id=reader_id).update(is_read=True)
+    messages_read(room_id, reader_id, updated)
+    return updated
+
+
+def reset(room_id, reader_id):
+    ChatParticipant.objects.filter(room_id=room_id, user_id=reader_id, unread_count__gt=0).update(unread_count=0)
+
+
+def repair(batch_size=1000):
+    """Recompute every counter from the messages; returns how many were wrong."""
+    actual = (ChatMessage.objects.filter(unread_q(), room_id=OuterRef('room_id'), receiver_id=OuterRef('user_id'))
+              .exclude(sender_id=OuterRef('user_id'))
+              .order_by().values('room_id').annotate(n=Count('id')).values('n'))
+    stale = (ChatParticipant.objects.annotate(actual=Coalesce(Subquery(actual), 0))
+             .exclude(unread_count=F('actual')).values_list('id', 'actual'))
+    fixed = 0
+    last_id = 0
+    while True:
+        rows = list(stale.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for participant_id, count in rows:
+            ChatParticipant.objects.filter(id=participant_id).update(unread_count=count)
+        fixed += len(rows)
+    return fixed
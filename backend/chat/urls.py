@@ -5,5 +5,7 @@ urlpatterns = [
     path('rooms/', views.ChatRoomListView.as_view(), name='chat-room-list'),
     path('room/<int:user_id>/', views.get_or_create_chat_room, name='get-or-create-chat-room'),
     path('messages/<int:room_id>/', views.get_chat_messages, name='get-chat-messages'),
+    path('messages/<int:room_id>/read/', views.mark_messages_read, name='mark-messages-read'),
+    path('search/', views.search_messages, name='search-chat-messages'),
     path('send/', views.send_message, name='send-message'),
 ]
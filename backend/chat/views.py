@@ -1,11 +1,15 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django.db.models import Q
 from django.contrib.auth import get_user_model
 from .models import ChatMessage, ChatRoom
 from .serializers import ChatMessageSerializer, ChatRoomSerializer
+from .pagination import InboxCursorPagination, decode_cursor, encode_cursor
+from . import membership, search, unread
 from notifications.models import Notification
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
@@ -13,11 +17,15 @@ from channels.layers import get_channel_layer
 User = get_user_model()
 
 class ChatRoomListView(generics.ListAPIView):
+    """The user's inbox, most recently active first, in two queries for any number of rooms."""
     serializer_class = ChatRoomSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = InboxCursorPagination
     
     def get_queryset(self):
-        return ChatRoom.objects.filter(participants=self.request.user)
+        return (ChatRoom.objects.for_user(self.request.user)
+                .select_related('last_message__sender', 'last_message__receiver')
+                .prefetch_related('participants'))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -27,35 +35,121 @@ def get_or_create_chat_room(request, user_id):
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Find existing chat room between these two users
-    chat_room = ChatRoom.objects.filter(
-        participants=request.user
-    ).filter(
-        participants=other_user
-    ).first()
-    
-    if not chat_room:
-        # Create new chat room
-        chat_room = ChatRoom.objects.create()
-        chat_room.participants.add(request.user, other_user)
+    chat_room, _ = ChatRoom.objects.get_or_create_for_pair(request.user.id, other_user.id)
+    chat_room = ChatRoom.objects.for_user(request.user).get(pk=chat_room.pk)
     
     return Response(ChatRoomSerializer(chat_room).data)
 
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+
+def _limit(request, default, maximum):
+    try:
+        return min(max(int(request.query_params.get('limit', default)), 1), maximum)
+    except ValueError:
+        raise ValidationError({'limit': 'Must be an integer'})
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_chat_messages(request, room_id):
+    """
+    Latest `limit` messages of a conversation, oldest first. `next` links to
+    the page before them (`before=<oldest message id>`) or is null.
+    """
     try:
         chat_room = ChatRoom.objects.get(id=room_id, participants=request.user)
     except ChatRoom.DoesNotExist:
         return Response({'error': 'Chat room not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    messages = ChatMessage.objects.filter(
-        Q(sender__in=chat_room.participants.all()) & 
-        Q(receiver__in=chat_room.participants.all())
-    ).order_by('timestamp')
+    limit = _limit(request, HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE)
+    
+    # Newest first on the (room, timestamp, id) index
+    messages = chat_room.messages.select_related('sender', 'receiver').order_by('-timestamp', '-id')
+    before = request.query_params.get('before')
+    if before:
+        pivot = chat_room.messages.filter(id=before).values('timestamp', 'id').first() if before.isdigit() else None
+        if pivot is None:
+            raise ValidationError({'before': 'Not a message of this conversation'})
+        messages = messages.filter(
+            Q(timestamp__lt=pivot['timestamp']) | Q(timestamp=pivot['timestamp'], id__lt=pivot['id'])
+        )
+    
+    page = list(messages[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit][::-1]
+    next_link = None
+    if has_more:
+        next_link = replace_query_param(request.build_absolute_uri(), 'before', page[0].id)
     
-    serializer = ChatMessageSerializer(messages, many=True)
-    return Response(serializer.data)
+    serializer = ChatMessageSerializer(page, many=True)
+    return Response({'next': next_link, 'results': serializer.data})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_messages(request):
+    """
+    The user's messages in all their conversations that contain every word of
+    `q`, newest first, each with a `snippet` of the text around the match and
+    the `highlights` offsets in it. `next` links to older hits (an opaque
+    `cursor`) or is null.
+    """
+    query = request.query_params.get('q', '')
+    terms = search.query_terms(query)
+    if not terms:
+        raise ValidationError({'q': 'Enter at least one word to search for'})
+    limit = _limit(request, SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE)
+    cursor = request.query_params.get('cursor')
+    before = decode_cursor(cursor) if cursor else None
+    
+    # One query: the user's postings joined to the messages and their senders/receivers
+    page = list(search.search(request.user.id, query, before=before)[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    next_link = None
+    if has_more:
+        next_link = replace_query_param(request.build_absolute_uri(), 'cursor',
+                                        encode_cursor(page[-1].timestamp, page[-1].message_id))
+    
+    messages = [posting.message for posting in page]
+    results = []
+    for message, data in zip(messages, ChatMessageSerializer(messages, many=True).data):
+        text, highlights = search.snippet(message.message, set(terms))
+        results.append({'room_id': message.room_id, 'message': data, 'snippet': text, 'highlights': highlights})
+    return Response({'next': next_link, 'results': results})
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_messages_read(request, room_id):
+    """
+    Mark every message to the user in the room sent up to and including
+    `up_to` (a message id; default: the latest) as read, and broadcast one
+    watermark to the room.
+    """
+    try:
+        chat_room = ChatRoom.objects.get(id=room_id, participants=request.user)
+    except ChatRoom.DoesNotExist:
+        return Response({'error': 'Chat room not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    up_to = request.data.get('up_to')
+    if up_to is not None and not isinstance(up_to, int) and not str(up_to).isdigit():
+        raise ValidationError({'up_to': 'Must be a message id'})
+    mark = unread.watermark(chat_room.id, None if up_to is None else int(up_to))
+    if mark is None:
+        if up_to is not None:
+            raise ValidationError({'up_to': 'Not a message of this conversation'})
+        return Response({'up_to': 0, 'updated': 0})
+    up_to = mark[1]
+    
+    updated = unread.mark_read_up_to(chat_room.id, request.user.id, mark)
+    if updated:
+        async_to_sync(get_channel_layer().group_send)(
+            membership.group_name(chat_room.id),
+            {'type': 'read_watermark', 'up_to': up_to, 'up_to_timestamp': mark[0].isoformat(),
+             'reader_id': request.user.id},
+        )
+    return Response({'up_to': up_to, 'updated': updated})
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -68,22 +162,15 @@ def send_message(request):
     except User.DoesNotExist:
         return Response({'error': 'Receiver not found'}, status=status.HTTP_404_NOT_FOUND)
     
+    chat_room, _ = ChatRoom.objects.get_or_create_for_pair(request.user.id, receiver.id)
+    
     message = ChatMessage.objects.create(
         sender=request.user,
         receiver=receiver,
+        room=chat_room,
         message=message_text
     )
-    
-    # Update or create chat room
-    chat_room = ChatRoom.objects.filter(
-        participants=request.user
-    ).filter(
-        participants=receiver
-    ).first()
-    
-    if not chat_room:
-        chat_room = ChatRoom.objects.create()
-        chat_room.participants.add(request.user, receiver)
+    unread.message_added(chat_room.id, receiver.id, request.user.id, message.timestamp)
     
     chat_room.last_message = message
     chat_room.save()
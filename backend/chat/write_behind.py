@@ -0,0 +1,210 @@
+"""
+Write-behind persistence for chat messages sent over WebSocket.
+
+With CHAT_WRITE_BEHIND on, ChatConsumer gives a message its id (chat.ids) and
+timestamp, broadcasts it to the room at once and adds it to this process's
+buffer instead of waiting on the database. The buffer is written in one
+transaction whenever CHAT_WRITE_BEHIND_BATCH messages are waiting, or
+CHAT_WRITE_BEHIND_DELAY_MS after the first of them arrived: one bulk_create
+for the messages, one participant UPDATE (unread counter and activity) per
+(room, receiver, sender) and one last_message UPDATE per room. Only after
+that commits does each sender get an `ack` listing its message ids, and the
+receivers their notifications. If the write fails, the sender gets
+`persist_failed` instead. Messages still buffered when a worker dies are
+never acknowledged, which is how clients can tell.
+
+Clients can act on a message (read, edit, delete) between its broadcast and
+its insert. ChatConsumer runs those actions through stored(): a message in
+this process's buffer is flushed first, and one held by another worker is
+waited for, for at most STORE_WAIT seconds, so the action lands on the row
+instead of finding nothing.
+"""
+import asyncio
+import logging
+import weakref
+from collections import Counter, defaultdict
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+
+from notifications.models import Notification
+from .models import ChatMessage, ChatRoom
+from . import search, unread
+
+logger = logging.getLogger(__name__)
+
+_buffers = weakref.WeakKeyDictionary()
+
+# How long an action waits for another worker to write the message it is on
+STORE_WAIT = 2.0
+
+
+def enabled():
+    return getattr(settings, 'CHAT_WRITE_BEHIND', False)
+
+
+def get_buffer():
+    """The buffer for the running event loop (one per worker process)."""
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None:
+        buffer = _buffers[loop] = WriteBehindBuffer(
+            getattr(settings, 'CHAT_WRITE_BEHIND_BATCH', 50),
+            getattr(settings, 'CHAT_WRITE_BEHIND_DELAY_MS', 20) / 1000,
+        )
+    return buffer
+
+
+async def stored(message_id):
+    """Whether message `message_id` is stored, writing or waiting for it if it is still buffered."""
+    buffer = get_buffer()
+    if buffer.holds(message_id):
+        await buffer.flush()
+        return True
+    exists = database_sync_to_async(lambda: ChatMessage.objects.filter(id=message_id).exists())
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STORE_WAIT
+    while not await exists():
+        if loop.time() >= deadline:
+            return False
+        # Other workers write their buffers at least this often
+        await asyncio.sleep(buffer.delay)
+    return True
+
+
+def notification_title(sender_username):
+    return f"New message from {sender_username}"
+
+
+def persist(batch):
+    """
+    Write a batch of accepted messages (dicts built by ChatConsumer) and return
+    the receivers' notifications. Runs in one transaction.
+    """
+    messages = [
+        ChatMessage(id=entry['id'], sender_id=entry['sender_id'], receiver_id=entry['receiver_id'],
+                    room_id=entry['room_id'], message=entry['message'], timestamp=entry['timestamp'])
+        for entry in batch
+    ]
+    added = Counter()
+    newest = {}
+    for entry in batch:
+        key = (entry['room_id'], entry['receiver_id'], entry['sender_id'])
+        added[key] += 1
+        newest[key] = max(newest.get(key, entry['timestamp']), entry['timestamp'])
+    latest = {}
+    for entry in batch:
+        current = latest.get(entry['room_id'])
+        if current is None or (entry['timestamp'], entry['id']) > (current['timestamp'], current['id']):
+            latest[entry['room_id']] = entry
+    notifications = [
+        Notification(
+            user_id=entry['receiver_id'],
+            title=notification_title(entry['sender_username']),
+            message=entry['message'],
+            data={'room_id': entry['room_id'], 'sender_id': entry['sender_id'], 'message_id': entry['id']},
+        )
+        for entry in batch
+    ]
+    with transaction.atomic():
+        ChatMessage.objects.bulk_create(messages)
+        # bulk_create sends no post_save, so index here
+        search.index_messages(messages, created=True)
+        for key, count in added.items():
+            unread.message_added(*key, newest[key], count=count)
+        for room_id, entry in latest.items():
+            ChatRoom.objects.filter(id=room_id).update(last_message_id=entry['id'])
+        if connection.features.can_return_rows_from_bulk_insert:
+            Notification.objects.bulk_create(notifications)
+        else:
+            # MySQL: bulk inserts don't report the new ids the clients need
+            for notification in notifications:
+                notification.save()
+    return notifications
+
+
+class WriteBehindBuffer:
+    def __init__(self, batch_size, delay):
+        self.batch_size = batch_size
+        self.delay = delay
+        self._pending = []
+        # Ids of the batch being written
+        self._writing = frozenset()
+        self._timer = None
+        self._tasks = set()
+        self._flush_lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def holds(self, message_id):
+        return message_id in self._writing or any(entry['id'] == message_id for entry in self._pending)
+
+    def add(self, entry):
+        self._pending.append(entry)
+        if len(self._pending) >= self.batch_size:
+            self._schedule(0)
+        elif self._timer is None:
+            self._schedule(self.delay)
+
+    def _schedule(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        # One write at a time, so last_message never moves backwards
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            self._writing = frozenset(entry['id'] for entry in batch)
+            try:
+                notifications = await database_sync_to_async(persist)(batch)
+            except Exception:
+                logger.exception('Writing %d buffered chat messages failed', len(batch))
+                await self._reply(batch, 'persist_failed')
+                return
+            finally:
+                self._writing = frozenset()
+            await self._reply(batch, 'message_ack')
+            await _send_notifications(notifications)
+
+    async def _reply(self, batch, event_type):
+        by_channel = defaultdict(list)
+        for entry in batch:
+            by_channel[entry['channel_name']].append(entry['id'])
+        channel_layer = get_channel_layer()
+        for channel_name, message_ids in by_channel.items():
+            await channel_layer.send(channel_name, {'type': event_type, 'message_ids': message_ids})
+
+
+async def _send_notifications(notifications):
+    channel_layer = get_channel_layer()
+    for notif in notifications:
+        await channel_layer.group_send(
+            f'user_{notif.user_id}',
+            {
+                'type': 'notify',
+                'payload': {
+                    'id': notif.id,
+                    'title': notif.title,
+                    'message': notif.message,
+                    'data': notif.data,
+                    'is_read': notif.is_read,
+                    'created_at': notif.created_at.isoformat(),
+                }
+            }
+        )
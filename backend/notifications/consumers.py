@@ -1,8 +1,8 @@
-import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from room_rental.wire import WireProtocolMixin
 
-class NotificationsConsumer(AsyncWebsocketConsumer):
+class NotificationsConsumer(WireProtocolMixin, AsyncWebsocketConsumer):
     async def connect(self):
         user = self.scope.get('user')
         if not user or not user.is_authenticated:
@@ -10,11 +10,11 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
             return
         self.group_name = f'user_{user.id}'
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        await self.accept_wire()
 
     async def disconnect(self, close_code):
         if hasattr(self, 'group_name'):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def notify(self, event):
-        await self.send(text_data=json.dumps(event['payload']))
+        await self.send_event(event['payload'])
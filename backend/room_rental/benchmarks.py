@@ -0,0 +1,18 @@
+"""
+Timing for the benchmark management commands.
+"""
+import math
+import statistics
+import time
+
+
+def time_ms(fn, repeat):
+    """Call `fn` `repeat` times; returns its (median, p95) wall time in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    # Nearest-rank p95
+    return statistics.median(samples), samples[math.ceil(len(samples) * 0.95) - 1]
@@ -0,0 +1,18 @@
+"""
+Throwaway data for management commands that benchmark or check endpoints
+against synthetic rows.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the block in a transaction that is always rolled back, so the rows it
+    creates never outlive it. Exceptions raised inside still propagate.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
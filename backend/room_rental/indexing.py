@@ -0,0 +1,40 @@
+"""
+Base for management commands that rebuild a search index from scratch.
+"""
+from django.core.management.base import BaseCommand
+
+
+class RebuildIndexCommand(BaseCommand):
+    """
+    Walks `get_queryset()` in primary-key batches, so memory stays flat on large
+    tables, and passes each batch to `index()`. `noun` names the rows in progress
+    output and `index_name` the index in the closing message.
+    """
+    noun = 'rows'
+    index_name = 'Search index'
+    default_batch_size = 500
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def index(self, batch):
+        raise NotImplementedError
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=self.default_batch_size)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = self.get_queryset().order_by('pk')
+        last_pk = 0
+        indexed = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            self.index(batch)
+            last_pk = batch[-1].pk
+            indexed += len(batch)
+            self.stdout.write(f'Indexed {indexed} {self.noun}...')
+
+        self.stdout.write(self.style.SUCCESS(f'{self.index_name} rebuilt for {indexed} {self.noun}'))
@@ -0,0 +1,175 @@
+"""
+Serving of user-uploaded media under MEDIA_URL.
+
+Responses carry a strong ETag and Last-Modified, answer conditional requests
+with 304 and honour single `Range` requests (206/416). Content-addressed room
+images (see rooms.storage) never change under their name, so they are sent
+with a one-year `immutable` Cache-Control; everything else is cached for
+MEDIA_CACHE_MAX_AGE and revalidated by ETag.
+
+With MEDIA_SENDFILE set, the view only resolves the file and sets headers;
+the bytes are sent by the front-end server:
+
+- 'x-accel-redirect' (nginx): `X-Accel-Redirect: <MEDIA_ACCEL_REDIRECT_PREFIX><path>`,
+  with a matching `internal` location aliased to MEDIA_ROOT.
+- 'x-sendfile' (Apache mod_xsendfile, lighttpd): `X-Sendfile: <absolute path>`.
+
+Either way the front end handles ranges itself, and ASGI workers never hold
+image bytes.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from rooms.storage import DIGEST_PATTERN
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _is_content_addressed(path):
+    # Exactly `<sha256><ext>`: the bytes can never change under this name
+    stem = os.path.splitext(posixpath.basename(path))[0]
+    match = DIGEST_PATTERN.match(stem)
+    return bool(match) and match.group(1) == stem
+
+
+def _etag(path, st):
+    if _is_content_addressed(path):
+        return '"%s"' % os.path.splitext(posixpath.basename(path))[0]
+    return '"%x-%x"' % (st.st_size, st.st_mtime_ns)
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _byte_range(request, etag, mtime, size):
+    """
+    (start, end) inclusive for a satisfiable single range, None to send the
+    whole file, or False when the range cannot be satisfied.
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is not None and if_range != etag and parse_http_date_safe(if_range) != int(mtime):
+        # The client's partial copy is stale; send everything
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Malformed or multi-range: a full response is always acceptable
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def _aread(path, start, length):
+    # Under ASGI a synchronous iterator would be read into memory before sending
+    handle = await sync_to_async(open)(path, 'rb')
+    try:
+        await sync_to_async(handle.seek)(start)
+        while length > 0:
+            chunk = await sync_to_async(handle.read)(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await sync_to_async(handle.close)()
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Media file not found')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('Media file not found')
+
+    etag = _etag(path, st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if _is_content_addressed(path)
+        else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}',
+        'Accept-Ranges': 'bytes',
+    }
+    if _not_modified(request, etag, st.st_mtime):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    mode = settings.MEDIA_SENDFILE
+    if mode:
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX + path)
+        else:
+            response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = _byte_range(request, etag, st.st_mtime, st.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f'bytes */{st.st_size}'
+        return response
+    start, end = byte_range or (0, st.st_size - 1)
+    length = end - start + 1
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+    else:
+        reader = _aread if isinstance(request, ASGIRequest) else _read
+        response = StreamingHttpResponse(reader(full_path, start, length), content_type=content_type, headers=headers)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+    response['Content-Length'] = str(length)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
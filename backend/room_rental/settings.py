@@ -129,6 +129,19 @@ STATIC_ROOT = os.getenv('STATIC_ROOT', str(BASE_DIR / 'staticfiles'))
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.getenv('MEDIA_ROOT', str(BASE_DIR / 'media'))
+# Served by room_rental.media.serve_media. In production set MEDIA_SENDFILE to
+# 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache) so the front-end server
+# sends the bytes; the nginx location for the prefix must be `internal`.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+# Cache lifetime for media that is not content-addressed (which is cached for a year)
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', '86400'))
+
+# Resumable room image uploads (rooms.uploads): partial files live outside
+# MEDIA_ROOT so they are never served; idle sessions expire after the TTL.
+ROOM_UPLOAD_SESSION_DIR = os.getenv('ROOM_UPLOAD_SESSION_DIR', str(BASE_DIR / 'upload_sessions'))
+ROOM_UPLOAD_SESSION_TTL = timedelta(hours=int(os.getenv('ROOM_UPLOAD_SESSION_TTL_HOURS', '24')))
+ROOM_UPLOAD_MAX_SIZE = int(os.getenv('ROOM_UPLOAD_MAX_SIZE', str(25 * 1024 * 1024)))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -180,6 +193,63 @@ else:
         },
     }
 
+# Cache Configuration
+# `room_responses` backs the public room list/detail response cache (rooms.cache).
+# Local memory is a per-process LRU capped at ROOM_CACHE_MAX_ENTRIES; use Redis
+# whenever more than one worker process serves the API so invalidation is shared.
+ROOM_RESPONSE_CACHE_ALIAS = 'room_responses'
+ROOM_CACHE_TIMEOUT = int(os.getenv('ROOM_CACHE_TIMEOUT', '300'))
+if REDIS_URL:
+    ROOM_RESPONSE_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'TIMEOUT': ROOM_CACHE_TIMEOUT,
+        'KEY_PREFIX': 'room_rental',
+    }
+else:
+    ROOM_RESPONSE_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'room-responses',
+        'TIMEOUT': ROOM_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('ROOM_CACHE_MAX_ENTRIES', '1000')),
+        },
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    ROOM_RESPONSE_CACHE_ALIAS: ROOM_RESPONSE_CACHE,
+}
+
+# Room image variants are produced by this many background threads per process
+# (rooms.images); `manage.py process_room_images` catches up on anything left pending.
+ROOM_IMAGE_WORKERS = int(os.getenv('ROOM_IMAGE_WORKERS', '2'))
+
+# Chat messages sent over WebSocket can be broadcast before they are stored and
+# written in batches (chat.write_behind): every CHAT_WRITE_BEHIND_BATCH messages,
+# or CHAT_WRITE_BEHIND_DELAY_MS after the first one waiting, whichever comes first.
+CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', 'False').lower() == 'true'
+CHAT_WRITE_BEHIND_BATCH = int(os.getenv('CHAT_WRITE_BEHIND_BATCH', '50'))
+CHAT_WRITE_BEHIND_DELAY_MS = int(os.getenv('CHAT_WRITE_BEHIND_DELAY_MS', '20'))
+# With write-behind on, ChatMessage ids are reserved this many at a time per process (chat.ids)
+CHAT_MESSAGE_ID_BLOCK = int(os.getenv('CHAT_MESSAGE_ID_BLOCK', '20'))
+
+# Chat presence and typing (chat.presence): users count as online while their
+# connection sent a frame within CHAT_PRESENCE_TTL seconds (clients heartbeat
+# more often than that), as typing for CHAT_TYPING_TTL seconds after a keystroke,
+# and each room gets at most one presence broadcast per CHAT_PRESENCE_INTERVAL_MS.
+CHAT_PRESENCE_TTL = int(os.getenv('CHAT_PRESENCE_TTL', '30'))
+CHAT_TYPING_TTL = int(os.getenv('CHAT_TYPING_TTL', '5'))
+CHAT_PRESENCE_INTERVAL_MS = int(os.getenv('CHAT_PRESENCE_INTERVAL_MS', '500'))
+
+# Clients on the compact 'roomrental.msgpack-deflate.v1' WebSocket subprotocol get
+# frames of at least this many bytes deflated (room_rental.wire)
+WEBSOCKET_DEFLATE_MIN_BYTES = int(os.getenv('WEBSOCKET_DEFLATE_MIN_BYTES', '512'))
+# Deflated client frames are refused (connection closed) past this size once inflated
+WEBSOCKET_MAX_INFLATED_BYTES = int(os.getenv('WEBSOCKET_MAX_INFLATED_BYTES', '262144'))
+
 # Production Security Settings
 if IS_PRODUCTION:
     # Security settings for HTTPS
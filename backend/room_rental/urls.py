@@ -2,9 +2,9 @@
 URL configuration for room_rental project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from .media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,7 +13,5 @@ urlpatterns = [
     path('api/wishlist/', include('rooms.wishlist_urls')),
     path('api/chat/', include('chat.urls')),
     path('api/notifications/', include('notifications.urls')),
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
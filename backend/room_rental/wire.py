@@ -0,0 +1,166 @@
+"""
+Wire formats for the chat and notification WebSockets.
+
+JSON text frames are the default and are what clients get unless they ask
+for something else. A client may instead request one of SUBPROTOCOLS in the
+WebSocket handshake (`new WebSocket(url, ['roomrental.msgpack.v1'])`):
+
+- 'roomrental.msgpack.v1': binary MessagePack frames. Keys are shortened per
+  SHORT_KEYS, and the TIMESTAMP_KEYS values are integer epoch
+  milliseconds instead of ISO strings.
+- 'roomrental.msgpack-deflate.v1': the same, but each frame starts with a
+  flag byte. 0 means the rest is MessagePack; 1 means it is raw-deflated
+  MessagePack. Frames are deflated when they are at least
+  WEBSOCKET_DEFLATE_MIN_BYTES long and compression makes them smaller.
+
+Frames sent by the client use the same format as the connection. Long keys
+are accepted alongside short ones. Nested values such as a notification's
+`data` are sent unchanged. A client frame that cannot be decoded, is not an
+object, or inflates past WEBSOCKET_MAX_INFLATED_BYTES raises InvalidFrame;
+inflation stops at that limit, so a small deflated frame cannot expand into
+a huge one in the worker.
+"""
+import json
+import zlib
+from datetime import datetime, timezone
+
+import msgpack
+from django.conf import settings
+
+JSON = 'json'
+MSGPACK = 'roomrental.msgpack.v1'
+MSGPACK_DEFLATE = 'roomrental.msgpack-deflate.v1'
+# In order of server preference
+SUBPROTOCOLS = (MSGPACK_DEFLATE, MSGPACK)
+
+SHORT_KEYS = {
+    'action': 'a',
+    'event': 'e',
+    'message': 'm',
+    'message_id': 'i',
+    'message_ids': 'I',
+    'sender_id': 's',
+    'sender_username': 'u',
+    'receiver_id': 'v',
+    'reader_id': 'r',
+    'up_to': 'w',
+    'up_to_timestamp': 'W',
+    'timestamp': 't',
+    'id': 'n',
+    'title': 'T',
+    'data': 'd',
+    'is_read': 'R',
+    'created_at': 'c',
+    'online': 'o',
+    'offline': 'O',
+    'typing': 'y',
+    'not_typing': 'Y',
+}
+LONG_KEYS = {short: long for long, short in SHORT_KEYS.items()}
+TIMESTAMP_KEYS = frozenset({'timestamp', 'created_at', 'up_to_timestamp'})
+
+_RAW = b'\x00'
+_DEFLATED = b'\x01'
+
+
+class InvalidFrame(ValueError):
+    pass
+
+
+def negotiate(requested):
+    """The first compact subprotocol the client offered that the server prefers, else JSON."""
+    offered = set(requested or ())
+    return next((protocol for protocol in SUBPROTOCOLS if protocol in offered), JSON)
+
+
+def _epoch_ms(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def _compact(payload):
+    return {
+        SHORT_KEYS.get(key, key): _epoch_ms(value) if key in TIMESTAMP_KEYS and value else value
+        for key, value in payload.items()
+    }
+
+
+def _deflate(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _inflate(data):
+    limit = getattr(settings, 'WEBSOCKET_MAX_INFLATED_BYTES', 262144)
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+    try:
+        inflated = inflater.decompress(data, limit)
+    except zlib.error as exc:
+        raise InvalidFrame('Corrupt deflate data') from exc
+    if inflater.unconsumed_tail:
+        raise InvalidFrame(f'Frame inflates past {limit} bytes')
+    return inflated
+
+
+def encode(payload, protocol):
+    """A frame for `payload`: str for JSON, bytes for the compact formats."""
+    if protocol == JSON:
+        return json.dumps(payload)
+    packed = msgpack.packb(_compact(payload), use_bin_type=True)
+    if protocol == MSGPACK:
+        return packed
+    if len(packed) >= getattr(settings, 'WEBSOCKET_DEFLATE_MIN_BYTES', 512):
+        deflated = _deflate(packed)
+        if len(deflated) < len(packed):
+            return _DEFLATED + deflated
+    return _RAW + packed
+
+
+def decode(frame, protocol):
+    """The payload of a frame from the client, with long keys. Raises InvalidFrame."""
+    try:
+        if protocol == JSON:
+            data = json.loads(frame)
+        else:
+            if isinstance(frame, str):
+                frame = frame.encode()
+            if protocol == MSGPACK_DEFLATE:
+                flag, frame = frame[:1], frame[1:]
+                if flag == _DEFLATED:
+                    frame = _inflate(frame)
+            data = msgpack.unpackb(frame, raw=False)
+    except InvalidFrame:
+        raise
+    except (ValueError, msgpack.UnpackException) as exc:
+        raise InvalidFrame('Undecodable frame') from exc
+    if not isinstance(data, dict):
+        raise InvalidFrame('Frame is not an object')
+    if protocol == JSON:
+        return data
+    return {LONG_KEYS.get(key, key): value for key, value in data.items()}
+
+
+class WireProtocolMixin:
+    """
+    For AsyncWebsocketConsumer subclasses: call accept_wire() instead of
+    accept(), send with send_event() and read frames with decode_frame(),
+    which raises InvalidFrame.
+    """
+    wire_protocol = JSON
+
+    async def accept_wire(self):
+        self.wire_protocol = negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=None if self.wire_protocol == JSON else self.wire_protocol)
+
+    async def send_event(self, payload):
+        frame = encode(payload, self.wire_protocol)
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    def decode_frame(self, text_data=None, bytes_data=None):
+        return decode(text_data if text_data is not None else bytes_data, self.wire_protocol)
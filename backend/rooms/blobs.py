@@ -0,0 +1,77 @@
+"""
+Reference counts for content-addressed room image files (see rooms.storage).
+
+Every RoomImage row holds one reference to the blob named by its `image`.
+Signals in rooms.signals acquire and release references on save and delete;
+bulk paths that skip signals call acquire_many themselves. A blob's file
+is deleted after the commit that drops its last
+reference, re-checking first that no new reference appeared in the meantime.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import MediaBlob, RoomImage
+from .storage import digest_from_name, room_image_storage
+
+
+def acquire_many(names):
+    """Add one reference per entry of `names` (a name listed twice gets two)."""
+    counts = Counter(name for name in names if name)
+    if not counts:
+        return
+    by_count = {}
+    for name, n in counts.items():
+        by_count.setdefault(n, []).append(name)
+    with transaction.atomic():
+        # Create missing rows at zero, then increment; safe against concurrent creators
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name, content_hash=digest_from_name(name)) for name in counts],
+            ignore_conflicts=True,
+        )
+        for n, group in by_count.items():
+            MediaBlob.objects.filter(name__in=group).update(ref_count=F('ref_count') + n)
+
+
+def acquire(name):
+    acquire_many([name])
+
+
+def release(name, on_delete=None):
+    """
+    Drop one reference to `name`. When it was the last, the file is deleted
+    once the transaction commits, and `on_delete` (if given) is called after it.
+    """
+    if not name:
+        return False
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+        if blob is not None and blob.ref_count > 1:
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            return False
+        if blob is not None:
+            blob.delete()
+        elif RoomImage.objects.filter(image=name).exists():
+            # Untracked but still in use (e.g. rows written before counting began)
+            return False
+
+    def delete():
+        if _delete_if_unreferenced(name) and on_delete is not None:
+            on_delete()
+
+    transaction.on_commit(delete)
+    return True
+
+
+def _delete_if_unreferenced(name):
+    if MediaBlob.objects.filter(name=name).exists() or RoomImage.objects.filter(image=name).exists():
+        return False
+    room_image_storage().delete(name)
+    return True
+
+
+def discard_unreferenced(names):
+    """Delete stored files nothing references, e.g. after a failed bulk insert."""
+    for name in set(names):
+        _delete_if_unreferenced(name)
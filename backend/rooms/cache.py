@@ -0,0 +1,154 @@
+"""
+Versioned response cache for the public room endpoints.
+
+Rendered responses are stored under a key built from a global room version,
+the request path and its normalized query string. Any Room/RoomImage (or room
+owner) change bumps the version from rooms.signals, which orphans every older
+entry at once; they age out of the LRU or TTL on their own. If the version key
+itself is evicted it restarts from the clock (in nanoseconds), never from a
+number an orphaned entry may still be stored under.
+
+The backend is the Django cache alias named by ROOM_RESPONSE_CACHE_ALIAS
+(see CACHES in settings): a size-capped local-memory LRU by default, or Redis
+when REDIS_URL is set. Only a shared backend gives cross-process invalidation.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+VERSION_KEY = 'rooms:version'
+CHANGED_AT_KEY = 'rooms:changed_at'
+HITS_KEY = 'rooms:stats:hits'
+MISSES_KEY = 'rooms:stats:misses'
+
+
+def get_cache():
+    return caches[getattr(settings, 'ROOM_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _incr(key):
+    cache = get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Missing or evicted; add() keeps a concurrent creator's value
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def _seed_version(cache, seed=None):
+    # add() keeps a concurrent creator's value
+    return cache.add(VERSION_KEY, seed or time.time_ns(), timeout=None)
+
+
+def current_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        seed = time.time_ns()
+        _seed_version(cache, seed)
+        cache.add(CHANGED_AT_KEY, int(time.time()), timeout=None)
+        version = cache.get(VERSION_KEY, seed)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached room response."""
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted; a fresh seed is already past every earlier version
+        if not _seed_version(cache):
+            cache.incr(VERSION_KEY)
+    cache.set(CHANGED_AT_KEY, int(time.time()), timeout=None)
+
+
+def stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': cache.get(VERSION_KEY),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def cache_key(request, version):
+    # Order and blank values must not split otherwise identical queries
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values if value != ''
+    )
+    raw = '|'.join([
+        request.get_host(),  # cursor links are absolute URLs
+        request.path,
+        request.accepted_renderer.format,
+        '&'.join(f'{name}={value}' for name, value in params),
+    ])
+    return f'rooms:response:{version}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+class VersionedResponseCacheMixin:
+    """
+    Serve GET requests of a public DRF view from the room response cache, with
+    ETag/Last-Modified validators and 304 responses.
+
+    Only JSON renders are cached, since the browsable API embeds per-user markup.
+    """
+
+    def get(self, request, *args, **kwargs):
+        self._response_cache_key = None
+        if request.accepted_renderer.format != 'json':
+            return super().get(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = cache_key(request, current_version())
+        entry = cache.get(key)
+        if entry is not None:
+            _incr(HITS_KEY)
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            self._set_validators(response, entry['etag'], entry['last_modified'])
+            response['X-Cache'] = 'HIT'
+            return get_conditional_response(
+                request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+            )
+
+        _incr(MISSES_KEY)
+        self._response_cache_key = key
+        return super().get(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_response_cache_key', None)
+        if key is None or not isinstance(response, Response) or response.status_code != 200:
+            return response
+
+        response.render()
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        last_modified = get_cache().get(CHANGED_AT_KEY) or int(time.time())
+        get_cache().set(key, {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'etag': etag,
+            'last_modified': last_modified,
+        })
+        self._set_validators(response, etag, last_modified)
+        response['X-Cache'] = 'MISS'
+        return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+    def _set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Clients may reuse a copy only after revalidating it
+        response['Cache-Control'] = 'public, no-cache'
@@ -0,0 +1,64 @@
+from functools import reduce
+from operator import and_
+
+from django.db.models import Count, Q
+
+from .models import Room
+
+# Rent bucket lower bounds; each bucket runs up to the next bound (last is open-ended)
+RENT_BUCKETS = [0, 5000, 10000, 15000, 20000, 30000, 50000]
+
+
+def _all(filters, *, skip=None):
+    return reduce(and_, (q for name, q in filters.items() if name != skip), Q())
+
+
+def _rent_bucket_q(index):
+    lower = RENT_BUCKETS[index]
+    q = Q(rent__gte=lower)
+    if index + 1 < len(RENT_BUCKETS):
+        q &= Q(rent__lt=RENT_BUCKETS[index + 1])
+    return q
+
+
+def room_facet_counts(queryset, filters):
+    """
+    Count rooms per room type, amenity and rent bucket in a single aggregate.
+
+    `filters` is the output of rooms.filters.room_filters. Each facet is
+    counted with every filter except its own, so selecting a room type or rent
+    range still reports counts for the alternatives.
+    """
+    filters = dict(filters)
+    # Location cannot be varied by a facet, so it narrows the scanned rows directly
+    location = filters.pop('location', None)
+    if location is not None:
+        queryset = queryset.filter(location)
+
+    everything = _all(filters)
+    except_type = _all(filters, skip='room_type')
+    except_rent = _all(filters, skip='rent')
+
+    aggregates = {'total': Count('id', filter=everything)}
+    for value, _ in Room.ROOM_TYPES:
+        aggregates[f'type__{value}'] = Count('id', filter=except_type & Q(room_type=value))
+    for amenity in Room.AMENITIES:
+        aggregates[f'amenity__{amenity}'] = Count('id', filter=everything & Q(**{amenity: True}))
+    for index in range(len(RENT_BUCKETS)):
+        aggregates[f'rent__{index}'] = Count('id', filter=except_rent & _rent_bucket_q(index))
+
+    counts = queryset.aggregate(**aggregates)
+
+    return {
+        'total': counts['total'],
+        'room_type': {value: counts[f'type__{value}'] for value, _ in Room.ROOM_TYPES},
+        'amenities': {amenity: counts[f'amenity__{amenity}'] for amenity in Room.AMENITIES},
+        'rent': [
+            {
+                'min': RENT_BUCKETS[index],
+                'max': RENT_BUCKETS[index + 1] if index + 1 < len(RENT_BUCKETS) else None,
+                'count': counts[f'rent__{index}'],
+            }
+            for index in range(len(RENT_BUCKETS))
+        ],
+    }
@@ -0,0 +1,46 @@
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Room
+from . import geo
+
+
+def room_filters(params):
+    """
+    Translate RoomListView query params into named Q objects.
+
+    Keeping each filter separate lets callers drop one of them, e.g. facet
+    counts for `room_type` are computed without the `room_type` filter so the
+    other types still show how many rooms they would return.
+    """
+    filters = {}
+
+    location = params.get('location', None)
+    min_rent = params.get('min_rent', None)
+    max_rent = params.get('max_rent', None)
+    room_type = params.get('room_type', None)
+    amenities = params.get('amenities', None)
+    bbox = geo.parse_bbox(params)
+
+    if location:
+        filters['location'] = Q(location__icontains=location)
+    if min_rent or max_rent:
+        rent = Q()
+        if min_rent:
+            rent &= Q(rent__gte=min_rent)
+        if max_rent:
+            rent &= Q(rent__lte=max_rent)
+        filters['rent'] = rent
+    if room_type:
+        filters['room_type'] = Q(room_type=room_type)
+    if amenities:
+        names = [name.strip() for name in amenities.split(',') if name.strip()]
+        unknown = [name for name in names if name not in Room.AMENITIES]
+        if unknown:
+            raise ValidationError({'amenities': f"Unknown amenities: {', '.join(unknown)}"})
+        # amenities=wifi,ac means "has wifi AND ac", resolved against the indexed bitmask
+        filters['amenities'] = Room.amenities_q(names)
+    if bbox:
+        filters['bbox'] = geo.bbox_q(*bbox)
+
+    return filters
@@ -0,0 +1,156 @@
+"""
+Grid-cell spatial index for rooms, usable on MySQL and SQLite without any
+spatial extension.
+
+The globe is cut into CELL_DEGREES x CELL_DEGREES cells numbered row-major, so
+the cells covering a bounding box form one contiguous id range per row of
+latitude. A radius or bbox search first prunes rooms with those indexed
+`geo_cell` ranges, then applies the exact latitude/longitude or haversine test
+to the few rows that survive.
+"""
+import math
+
+from django.db.models import F, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from rest_framework.exceptions import ValidationError
+
+CELL_DEGREES = 0.01  # ~1.1 km of latitude
+CELL_COLUMNS = round(360 / CELL_DEGREES)
+# Above this many latitude rows one spanning range is cheaper than many small ones
+MAX_CELL_ROWS = 64
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_RADIUS_KM = 5
+MAX_RADIUS_KM = 50
+
+
+def _row(lat):
+    return min(int((lat + 90) // CELL_DEGREES), round(180 / CELL_DEGREES) - 1)
+
+
+def _column(lng):
+    return min(int((lng + 180) // CELL_DEGREES), CELL_COLUMNS - 1)
+
+
+def cell_for(lat, lng):
+    """Grid cell id for a point, or None when the point is unknown."""
+    if lat is None or lng is None:
+        return None
+    return _row(lat) * CELL_COLUMNS + _column(lng)
+
+
+def cell_ranges(min_lat, min_lng, max_lat, max_lng):
+    """Inclusive (low, high) cell id ranges covering a bounding box."""
+    first_row, last_row = _row(min_lat), _row(max_lat)
+    first_col, last_col = _column(min_lng), _column(max_lng)
+    if last_row - first_row + 1 > MAX_CELL_ROWS:
+        return [(first_row * CELL_COLUMNS + first_col, last_row * CELL_COLUMNS + last_col)]
+    return [
+        (row * CELL_COLUMNS + first_col, row * CELL_COLUMNS + last_col)
+        for row in range(first_row, last_row + 1)
+    ]
+
+
+def boxes_q(boxes):
+    """
+    Q for rooms inside any of several bounding boxes: one OR of indexed cell
+    ranges, then the exact test, so the planner still sees a single range scan.
+    """
+    cells = Q()
+    exact = Q()
+    for min_lat, min_lng, max_lat, max_lng in boxes:
+        for low, high in cell_ranges(min_lat, min_lng, max_lat, max_lng):
+            cells |= Q(geo_cell__range=(low, high))
+        exact |= Q(latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+    return cells & exact
+
+
+def bbox_q(min_lat, min_lng, max_lat, max_lng):
+    """Q for rooms inside a bounding box: indexed cell pruning plus the exact test."""
+    return boxes_q([(min_lat, min_lng, max_lat, max_lng)])
+
+
+def radius_bbox(lat, lng, radius_km):
+    """
+    Bounding boxes enclosing a circle: one, or two when the circle crosses the
+    antimeridian (longitude wraps around rather than being clamped at ±180).
+    """
+    # Exact bounds on the same sphere distance_km() measures on
+    angle = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angle)
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if min_lat == -90.0 or max_lat == 90.0:
+        # Reaches a pole, where every longitude meets
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    # Widest longitude of the circle, which is slightly poleward of its centre
+    dlng = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+    west, east = lng - dlng, lng + dlng
+    if west < -180:
+        return [(min_lat, west + 360, max_lat, 180.0), (min_lat, -180.0, max_lat, east)]
+    if east > 180:
+        return [(min_lat, west, max_lat, 180.0), (min_lat, -180.0, max_lat, east - 360)]
+    return [(min_lat, west, max_lat, east)]
+
+
+def distance_km(lat, lng):
+    """
+    Haversine distance in km from (lat, lng) to each room, as an ORM
+    expression; correct across the antimeridian since sin² of half the
+    longitude difference repeats every 360°.
+    """
+    dlat = Radians(F('latitude') - lat) / 2
+    dlng = Radians(F('longitude') - lng) / 2
+    a = Power(Sin(dlat), 2) + math.cos(math.radians(lat)) * Cos(Radians(F('latitude'))) * Power(Sin(dlng), 2)
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def near(queryset, lat, lng, radius_km):
+    """Rooms within `radius_km` of a point, annotated with `distance` in km."""
+    return (
+        queryset
+        .filter(boxes_q(radius_bbox(lat, lng, radius_km)))
+        .annotate(distance=distance_km(lat, lng))
+        .filter(distance__lte=radius_km)
+    )
+
+
+def _floats(raw, count, param):
+    try:
+        values = [float(part) for part in raw.split(',')]
+    except ValueError:
+        values = []
+    if len(values) != count or not all(math.isfinite(v) for v in values):
+        raise ValidationError({param: f'Expected {count} comma-separated numbers'})
+    return values
+
+
+def _check_point(lat, lng, param):
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValidationError({param: 'Latitude must be within ±90 and longitude within ±180'})
+
+
+def parse_near(params):
+    """(lat, lng, radius_km) from `near=lat,lng&radius=km`, or None."""
+    raw = params.get('near', None)
+    if not raw:
+        return None
+    lat, lng = _floats(raw, 2, 'near')
+    _check_point(lat, lng, 'near')
+    radius = params.get('radius', None)
+    radius_km = _floats(radius, 1, 'radius')[0] if radius else DEFAULT_RADIUS_KM
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValidationError({'radius': f'Must be between 0 and {MAX_RADIUS_KM} km'})
+    return lat, lng, radius_km
+
+
+def parse_bbox(params):
+    """(min_lat, min_lng, max_lat, max_lng) from `bbox=`, or None."""
+    raw = params.get('bbox', None)
+    if not raw:
+        return None
+    min_lat, min_lng, max_lat, max_lng = _floats(raw, 4, 'bbox')
+    _check_point(min_lat, min_lng, 'bbox')
+    _check_point(max_lat, max_lng, 'bbox')
+    if min_lat > max_lat or min_lng > max_lng:
+        raise ValidationError({'bbox': 'Expected min_lat,min_lng,max_lat,max_lng'})
+    return min_lat, min_lng, max_lat, max_lng
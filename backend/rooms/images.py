@@ -0,0 +1,218 @@
+"""
+Background pipeline producing resized JPEG and WebP variants of room images.
+
+Uploads enqueue the new RoomImage once its transaction commits and return
+immediately; a small thread pool in the web process opens the original,
+records its dimensions and writes one JPEG and one WebP per VARIANT_WIDTHS
+entry that is not wider than the original. Work still queued when a process
+exits is picked up again by `manage.py process_room_images`, which handles
+every image left in the pending state.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connection, transaction
+from PIL import Image, ImageOps
+
+from .models import Room, RoomImage
+from . import blobs
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> maximum width in pixels
+VARIANT_WIDTHS = {
+    'thumb': 320,
+    'medium': 800,
+    'large': 1600,
+}
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_queued = 0
+_queued_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ROOM_IMAGE_WORKERS', 2),
+                thread_name_prefix='room-images',
+            )
+        return _executor
+
+
+def _adjust_queued(delta):
+    global _queued
+    with _queued_lock:
+        _queued += delta
+
+
+def enqueue(image_id):
+    """Process an image in the background once the current transaction commits."""
+    transaction.on_commit(lambda: _submit(image_id))
+
+
+def _submit(image_id):
+    _adjust_queued(1)
+    _get_executor().submit(_run, image_id)
+
+
+def _run(image_id):
+    try:
+        process_image(image_id)
+    except Exception:
+        logger.exception('Processing room image %s failed', image_id)
+    finally:
+        _adjust_queued(-1)
+        # Worker threads hold their own connection; don't leak it between jobs
+        connection.close()
+
+
+def backlog():
+    """
+    Queued work: jobs waiting in this process's pool and images pending
+    anywhere. The pool lives in each web worker, so `queued_in_process` is only
+    meaningful when asked from one (see the image-backlog endpoint); `process`
+    tells the workers apart.
+    """
+    return {
+        'process': os.getpid(),
+        'queued_in_process': _queued,
+        'pending': RoomImage.objects.filter(processing_status=RoomImage.STATUS_PENDING).count(),
+        'failed': RoomImage.objects.filter(processing_status=RoomImage.STATUS_FAILED).count(),
+    }
+
+
+def attach_uploads(room, files):
+    """
+    Save already-validated uploaded files to storage and attach them to `room`
+    with a single bulk_create. Returns the new RoomImage rows, in order. All
+    room image uploads come through here, holding the room row lock.
+    """
+    images = [RoomImage(room=room, image=upload) for upload in files]
+    try:
+        for image in images:
+            # Storage hashes and copies in chunks (or moves a temporary upload)
+            image.commit_image()
+        with transaction.atomic():
+            # Every insert into this room goes through here, so while the room row
+            # is locked the room's only new image ids are the ones inserted below
+            Room.objects.select_for_update().filter(pk=room.pk).values_list('pk', flat=True).get()
+            before = RoomImage.objects.filter(room=room).order_by('-id').values_list('id', flat=True).first() or 0
+            created = RoomImage.objects.bulk_create(images)
+            if created and created[0].pk is None:
+                # MySQL does not return ids from bulk inserts; a multi-row insert gets ascending ids
+                ids = list(RoomImage.objects.filter(room=room, id__gt=before).order_by('id').values_list('id', flat=True))
+                if len(ids) != len(created):
+                    raise DatabaseError(f'Expected {len(created)} new images in room {room.pk}, found {len(ids)}')
+                for image, pk in zip(created, ids):
+                    image.pk = pk
+            # bulk_create skips post_save, which would count these references,
+            # queue processing and invalidate room responses
+            blobs.acquire_many(image.image.name for image in created)
+            for image in created:
+                enqueue(image.pk)
+            transaction.on_commit(cache.bump_version)
+    except Exception:
+        blobs.discard_unreferenced(image.image.name for image in images if image.image._committed)
+        raise
+    return created
+
+
+def _variant_path(image, name, extension):
+    if image.content_hash:
+        # Shared by every image with the same bytes
+        return f'room_images/variants/{image.content_hash[:2]}/{image.content_hash}_{name}.{extension}'
+    stem = os.path.splitext(os.path.basename(image.image.name))[0]
+    return f'room_images/variants/{image.pk}/{stem}_{name}.{extension}'
+
+
+def _is_shared(image, path):
+    return bool(image.content_hash) and os.path.basename(path).startswith(image.content_hash)
+
+
+def _encode(picture, fmt):
+    pil_format, _, options = FORMATS[fmt]
+    if pil_format == 'JPEG' and picture.mode not in ('RGB', 'L'):
+        picture = picture.convert('RGB')
+    buffer = io.BytesIO()
+    picture.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def process_image(image_id):
+    """Record dimensions and write every variant of one RoomImage."""
+    try:
+        image = RoomImage.objects.get(pk=image_id)
+    except RoomImage.DoesNotExist:
+        return
+
+    if image.content_hash:
+        done = (RoomImage.objects.filter(content_hash=image.content_hash, processing_status=RoomImage.STATUS_READY)
+                .exclude(pk=image.pk).only('width', 'height', 'variants').first())
+        if done is not None and all(_is_shared(image, entry.get(fmt, '')) for entry in done.variants.values() for fmt in FORMATS):
+            # Identical bytes were processed already; their variants are shared
+            image.width, image.height, image.variants = done.width, done.height, done.variants
+            image.processing_status = RoomImage.STATUS_READY
+            image.save(update_fields=['width', 'height', 'variants', 'processing_status'])
+            return
+
+    try:
+        with image.image.open('rb') as source:
+            original = ImageOps.exif_transpose(Image.open(source))
+            original.load()
+        width, height = original.size
+
+        variants = {}
+        for name, max_width in VARIANT_WIDTHS.items():
+            if max_width >= width and variants:
+                # Never upscale; the smallest variant is still produced for tiny originals
+                break
+            if max_width < width:
+                picture = original.resize((max_width, max(round(height * max_width / width), 1)), Image.LANCZOS)
+            else:
+                picture = original
+            entry = {'width': picture.width, 'height': picture.height}
+            for fmt, (_, extension, _) in FORMATS.items():
+                path = _variant_path(image, name, extension)
+                if default_storage.exists(path):
+                    default_storage.delete(path)
+                entry[fmt] = default_storage.save(path, ContentFile(_encode(picture, fmt)))
+            variants[name] = entry
+    except Exception:
+        RoomImage.objects.filter(pk=image_id).update(processing_status=RoomImage.STATUS_FAILED)
+        raise
+
+    image.width, image.height = width, height
+    image.variants = variants
+    image.processing_status = RoomImage.STATUS_READY
+    try:
+        image.save(update_fields=['width', 'height', 'variants', 'processing_status'])
+    except DatabaseError:
+        # Deleted while we were working on it
+        delete_variants(image)
+        raise
+
+
+def delete_variants(image, shared=False):
+    """Delete the image's variant files; content-hash keyed ones only when `shared` (last reference gone)."""
+    for entry in (image.variants or {}).values():
+        for fmt in FORMATS:
+            path = entry.get(fmt)
+            if not path or (_is_shared(image, path) and not shared):
+                continue
+            if default_storage.exists(path):
+                default_storage.delete(path)
@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from room_rental.fixtures import rolled_back
+from rest_framework.test import APIClient
+from rooms.models import Room, RoomImage
+from rooms import cache
+
+User = get_user_model()
+
+DESCRIPTION = (
+    'Spacious, well lit apartment close to the metro station, supermarkets and hospitals. '
+    'Includes modular kitchen, covered parking, power backup and 24x7 water supply. '
+) * 4
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and latency of full room responses against view=card'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=2000)
+        parser.add_argument('--images', type=int, default=8, help='Images per room')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per request')
+
+    def handle(self, *args, **options):
+        # Synthetic rows only exist for the duration of the benchmark
+        with rolled_back():
+            self._populate(options['rooms'], options['images'])
+            self._run(options['repeat'])
+
+    def _populate(self, count, images):
+        owner = User.objects.create_user(username='__card_benchmark__', password=None, role='owner',
+                                         email='owner@example.com', phone='9876543210')
+        Room.objects.bulk_create([
+            Room(title=f'Benchmark room {i}', description=DESCRIPTION, rent=5000 + i,
+                 location='Koramangala, Bangalore', room_type='1bhk', wifi=True, owner=owner)
+            for i in range(count)
+        ], batch_size=1000)
+        RoomImage.objects.bulk_create([
+            RoomImage(room_id=room_id, image=f'room_images/benchmark_{room_id}_{n}.jpg')
+            for room_id in Room.objects.filter(owner=owner).values_list('id', flat=True)
+            for n in range(images)
+        ], batch_size=1000)
+
+    def _measure(self, client, url, repeat):
+        samples = []
+        size = 0
+        for _ in range(repeat):
+            # Defeat the response cache so every run serializes from the database
+            cache.bump_version()
+            start = time.perf_counter()
+            response = client.get(url, HTTP_HOST='localhost')
+            samples.append((time.perf_counter() - start) * 1000)
+            size = len(response.content)
+        return statistics.median(samples), size
+
+    def _run(self, repeat):
+        client = APIClient()
+        self.stdout.write(f"{'request':<34} {'p50 ms':>9} {'bytes':>10}")
+        for label, url in (('list (all rooms)', '/api/rooms/'), ('list (page of 50)', '/api/rooms/?page_size=50')):
+            full_ms, full_bytes = self._measure(client, url, repeat)
+            joiner = '&' if '?' in url else '?'
+            card_ms, card_bytes = self._measure(client, f'{url}{joiner}view=card', repeat)
+            self.stdout.write(f'{label + " full":<34} {full_ms:>9.2f} {full_bytes:>10}')
+            self.stdout.write(f'{label + " card":<34} {card_ms:>9.2f} {card_bytes:>10}')
+            self.stdout.write(
+                f'{"  reduction":<34} {1 - card_ms / full_ms:>9.0%} {1 - card_bytes / full_bytes:>10.0%}'
+            )
@@ -0,0 +1,80 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from room_rental.benchmarks import time_ms
+from room_rental.fixtures import rolled_back
+from rooms.models import Room
+from rooms import search
+
+User = get_user_model()
+
+AREAS = [
+    'Koramangala', 'Indiranagar', 'Whitefield', 'Jayanagar', 'Hebbal', 'Marathahalli',
+    'Bellandur', 'Yelahanka', 'Malleshwaram', 'Banashankari', 'Electronic City', 'HSR Layout',
+]
+CITIES = ['Bangalore', 'Pune', 'Hyderabad', 'Chennai', 'Mumbai', 'Delhi']
+WORDS = [
+    'spacious', 'modern', 'affordable', 'luxury', 'cozy', 'furnished', 'balcony', 'garden',
+    'metro', 'station', 'college', 'students', 'professionals', 'family', 'quiet', 'security',
+    'kitchen', 'gym', 'pool', 'parking', 'terrace', 'sunlit', 'renovated', 'veg', 'pet',
+    'friendly', 'lift', 'power', 'backup', 'water', 'supply', 'shopping', 'hospital', 'park',
+]
+
+# Rare per-room terms, to show selective queries next to very common ones
+LANDMARKS = 5000
+
+
+class Command(BaseCommand):
+    help = 'Compare the inverted-index room search against location__icontains on synthetic data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Synthetic rows only exist for the duration of the benchmark
+        with rolled_back():
+            self._populate(options['rooms'], rng)
+            self._run(options['repeat'], options['page_size'])
+
+    def _populate(self, count, rng):
+        owner = User.objects.create_user(username='__search_benchmark__', password=None, role='owner')
+        self.stdout.write(f'Creating {count} rooms...')
+        start = time.perf_counter()
+        batch_size = 2000
+        for offset in range(0, count, batch_size):
+            rooms = Room.objects.bulk_create([
+                Room(
+                    title=f"{rng.choice(WORDS).title()} {rng.choice(['1BHK', '2BHK', 'PG', 'studio'])} in {rng.choice(AREAS)}",
+                    description=' '.join(rng.choices(WORDS, k=15)) + f' near Landmark{rng.randrange(LANDMARKS)}',
+                    rent=rng.randrange(3000, 60000, 500),
+                    location=f'{rng.choice(AREAS)}, {rng.choice(CITIES)}',
+                    room_type=rng.choice(Room.ROOM_TYPES)[0],
+                    owner=owner,
+                )
+                for _ in range(min(batch_size, count - offset))
+            ])
+            if rooms[0].pk is None:
+                # Backends without RETURNING (MySQL) leave pks unset on bulk_create
+                rooms = list(Room.objects.filter(owner=owner).order_by('-id')[:len(rooms)])
+            search.index_rooms(rooms)
+        self.stdout.write(f'Created and indexed in {time.perf_counter() - start:.1f}s')
+
+    def _run(self, repeat, page_size):
+        base = Room.objects.filter(is_available=True)
+        queries = ['Koramangala', 'Pune', 'Landmark42', 'balcony', 'metro station', 'gym pool Whitefield']
+
+        # icontains only looks at location; the index covers title, description and location
+        self.stdout.write(f"{'query':<24} {'path':<10} {'p50 ms':>8} {'p95 ms':>8} {'hits':>8}")
+        for query in queries:
+            icontains = base.filter(location__icontains=query).order_by('-created_at', '-id')
+            ranked = search.search(base, query).order_by('-search_rank', '-id')
+            for path, qs in (('icontains', icontains), ('index', ranked)):
+                p50, p95 = time_ms(lambda: list(qs.values_list('id', flat=True)[:page_size]), repeat)
+                hits = qs.count()
+                self.stdout.write(f'{query:<24} {path:<10} {p50:>8.2f} {p95:>8.2f} {hits:>8}')
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rooms.models import RoomImage
+from rooms.storage import file_digest, hashed_name, room_image_storage
+from rooms import blobs, cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Move room images stored before content addressing to hash-named blobs, '
+        'so identical files are kept once; duplicates are deleted as their last reference moves'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be reclaimed')
+
+    def handle(self, *args, **options):
+        storage = room_image_storage()
+        dry_run = options['dry_run']
+        moved = duplicates = missing = 0
+        reclaimed = 0
+        seen = set()
+
+        legacy = RoomImage.objects.filter(content_hash='').exclude(image='').order_by('id').only('id', 'image')
+        last_id = 0
+        while True:
+            # Keyset batches: rows leave the legacy set as they are rewritten
+            batch = list(legacy.filter(id__gt=last_id)[:500])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            for image in batch:
+                name = image.image.name
+                if not storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f'Image {image.pk}: {name} is missing from storage')
+                    continue
+                with storage.open(name, 'rb') as handle:
+                    digest = file_digest(handle)
+                    target = hashed_name(name, digest)
+                    if storage.exists(target) or target in seen:
+                        duplicates += 1
+                        reclaimed += storage.size(name)
+                    elif not dry_run:
+                        target = storage.save(name, handle, digest=digest)
+                seen.add(target)
+                moved += 1
+                if dry_run:
+                    continue
+
+                with transaction.atomic():
+                    # update() keeps the row's variants and skips the save signals
+                    RoomImage.objects.filter(pk=image.pk).update(image=target, content_hash=digest)
+                    blobs.acquire(target)
+                    # Deletes the old file after commit unless another row still uses it
+                    blobs.release(name)
+
+        if moved and not dry_run:
+            cache.bump_version()
+        moved_verb, reclaim_verb = ('to move', 'Would reclaim') if dry_run else ('moved', 'Reclaimed')
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} images {moved_verb} to content-addressed names ({duplicates} duplicates, {missing} missing). '
+            f'{reclaim_verb} {reclaimed / 1024 / 1024:.1f} MiB'
+        ))
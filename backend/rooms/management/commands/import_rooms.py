@@ -0,0 +1,160 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rooms.models import Room, RoomImportCheckpoint
+from rooms.serializers import RoomCreateSerializer
+from rooms import cache, rent_stats, search
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream rooms from a CSV or JSONL file into the database in batched, resumable chunks. '
+        'Columns follow RoomCreateSerializer, plus an optional `owner` username per row.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--owner', help='Username owning rows without an `owner` column')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert and transaction')
+        parser.add_argument('--job', help='Checkpoint name; defaults to the file name. Rerun with the same job to resume')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start over')
+        parser.add_argument('--errors', help='Write rejected rows with their validation errors to this JSONL file')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+
+        default_owner_id = None
+        if options['owner']:
+            try:
+                default_owner_id = User.objects.get(username=options['owner']).id
+            except User.DoesNotExist:
+                raise CommandError(f"Owner {options['owner']} not found")
+
+        job = options['job'] or os.path.basename(path)
+        checkpoint, _ = RoomImportCheckpoint.objects.get_or_create(name=job)
+        if options['restart']:
+            checkpoint.records_done = checkpoint.inserted = checkpoint.failed = 0
+            checkpoint.completed = False
+            checkpoint.save()
+        elif checkpoint.completed:
+            self.stdout.write(self.style.WARNING(f'Job {job} already completed; use --restart to import again'))
+            return
+        elif checkpoint.records_done:
+            self.stdout.write(f'Resuming job {job} after record {checkpoint.records_done}')
+
+        errors_file = open(options['errors'], 'a', encoding='utf-8') if options['errors'] else None
+        start = time.perf_counter()
+        session_records = 0
+        try:
+            with open(path, newline='', encoding='utf-8') as handle:
+                records = self._read(handle, fmt)
+                # Skip what earlier runs committed; reading is cheap compared to validating
+                for _ in islice(records, checkpoint.records_done):
+                    pass
+                while True:
+                    chunk = list(islice(records, batch_size))
+                    if not chunk:
+                        break
+                    self._import_chunk(chunk, checkpoint, default_owner_id, errors_file)
+                    session_records += len(chunk)
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(
+                        f'{checkpoint.records_done} records: {checkpoint.inserted} inserted, '
+                        f'{checkpoint.failed} rejected ({session_records / elapsed:.0f} records/s)'
+                    )
+        finally:
+            if errors_file:
+                errors_file.close()
+
+        checkpoint.completed = True
+        checkpoint.save(update_fields=['completed', 'updated_at'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {checkpoint.inserted} rooms, rejected {checkpoint.failed}, '
+            f'{session_records} records in {elapsed:.1f}s'
+        ))
+
+    def _read(self, handle, fmt):
+        """Yield (record number, row dict or parse error) without loading the file."""
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(handle), start=1):
+                # Empty cells mean "not provided", so serializer defaults apply
+                yield number, {key: value for key, value in row.items() if key and value not in ('', None)}
+            return
+        number = 0
+        for line in handle:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                row = exc
+            if not isinstance(row, (dict, ValueError)):
+                row = ValueError('Expected a JSON object')
+            yield number, row
+
+    def _import_chunk(self, chunk, checkpoint, default_owner_id, errors_file):
+        # One lookup per chunk for the owners it names
+        usernames = {row['owner'] for _, row in chunk if isinstance(row, dict) and row.get('owner')}
+        owners = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        # One serializer validates every row; building its fields per row costs more than the insert
+        validator = RoomCreateSerializer()
+        rooms = []
+        rejected = []
+        for number, row in chunk:
+            if isinstance(row, Exception):
+                rejected.append((number, {'row': [str(row)]}))
+                continue
+            owner_name = row.get('owner')
+            owner_id = owners.get(owner_name) if owner_name else default_owner_id
+            if owner_id is None:
+                rejected.append((number, {'owner': [f'Unknown owner {owner_name!r}' if owner_name else 'No owner given']}))
+                continue
+            try:
+                validated = validator.run_validation(row)
+            except ValidationError as exc:
+                rejected.append((number, exc.detail))
+                continue
+            room = Room(owner_id=owner_id, **validated)
+            room.sync_derived_fields()
+            rooms.append(room)
+
+        with transaction.atomic():
+            last_id = Room.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            Room.objects.bulk_create(rooms, batch_size=len(rooms) or 1)
+            # bulk_create skips the post_save signals, so derived data is written here
+            rent_stats.record_many(key for key in (room.rent_stats_key() for room in rooms) if key)
+            indexed = rooms
+            if rooms and rooms[0].pk is None:
+                # MySQL does not return ids from bulk inserts; re-indexing a concurrent
+                # writer's rooms as well is harmless
+                indexed = Room.objects.filter(id__gt=last_id).only('id', *search.SEARCH_FIELDS)
+            search.index_rooms(indexed)
+            if rooms:
+                transaction.on_commit(cache.bump_version)
+
+            checkpoint.records_done += len(chunk)
+            checkpoint.inserted += len(rooms)
+            checkpoint.failed += len(rejected)
+            checkpoint.save()
+
+        if errors_file:
+            for number, errors in rejected:
+                errors_file.write(json.dumps({'record': number, 'errors': errors}) + '\n')
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rooms.models import RoomImage
+from rooms import images
+
+
+class Command(BaseCommand):
+    help = 'Show the room image processing backlog and produce variants for pending images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='store_true', help='Only print the backlog')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry images whose processing failed')
+        parser.add_argument('--all', action='store_true', help='Reprocess every image, e.g. after changing variant sizes')
+
+    def handle(self, *args, **options):
+        backlog = images.backlog()
+        self.stdout.write(f"pending={backlog['pending']} failed={backlog['failed']}")
+        if options['status']:
+            return
+
+        queryset = RoomImage.objects.all()
+        if not options['all']:
+            statuses = [RoomImage.STATUS_PENDING]
+            if options['retry_failed']:
+                statuses.append(RoomImage.STATUS_FAILED)
+            queryset = queryset.filter(processing_status__in=statuses)
+
+        done = failed = 0
+        start = time.perf_counter()
+        for image_id in queryset.order_by('id').values_list('id', flat=True).iterator():
+            try:
+                images.process_image(image_id)
+                done += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Image {image_id}: {exc}')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Processed {done} images, {failed} failed in {elapsed:.1f}s'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from rooms import uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete expired resumable image upload sessions and orphaned partial files'
+
+    def handle(self, *args, **options):
+        sessions, orphans = uploads.purge_expired()
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {sessions} expired upload sessions and {orphans} orphaned partial files'
+        ))
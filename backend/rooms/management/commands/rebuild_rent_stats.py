@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from rooms import rent_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-location rent statistics from the rooms table'
+
+    def handle(self, *args, **options):
+        summaries = rent_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {summaries} rent summaries'))
@@ -0,0 +1,14 @@
+from room_rental.indexing import RebuildIndexCommand
+from rooms.models import Room
+from rooms import search
+
+
+class Command(RebuildIndexCommand):
+    help = 'Rebuild the room full-text search index from scratch'
+    noun = 'rooms'
+
+    def get_queryset(self):
+        return Room.objects.only('id', *search.SEARCH_FIELDS)
+
+    def index(self, batch):
+        search.index_rooms(batch)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from rooms import cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the room response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invalidate', action='store_true', help='Bump the version, dropping all cached responses')
+
+    def handle(self, *args, **options):
+        if options['invalidate']:
+            cache.bump_version()
+            self.stdout.write(self.style.SUCCESS('Room response cache invalidated'))
+        stats = cache.stats()
+        self.stdout.write(
+            f"version={stats['version']} hits={stats['hits']} misses={stats['misses']} "
+            f"hit_ratio={stats['hit_ratio']:.1%}"
+        )
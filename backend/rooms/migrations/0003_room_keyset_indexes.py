@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0002_wishlistitem'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='room',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_available', 'created_at', 'id'], name='room_avail_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_available', 'room_type', 'created_at', 'id'], name='room_avail_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_available', 'rent', 'id'], name='room_avail_rent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_available', 'room_type', 'rent', 'id'], name='room_avail_type_rent_idx'),
+        ),
+    ]
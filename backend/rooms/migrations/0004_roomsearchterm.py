@@ -0,0 +1,26 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0003_room_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField()),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='rooms.room')),
+            ],
+            options={
+                'unique_together': {('term', 'room')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0004_roomsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='amenity_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_available', 'amenity_mask', 'created_at', 'id'], name='room_avail_amenity_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Case, IntegerField, Max, Min, Value, When
+
+# Frozen copy of Room.AMENITIES; bit i is set when AMENITIES[i] is true
+AMENITIES = ('wifi', 'ac', 'furnished', 'parking', 'laundry')
+BATCH_SIZE = 5000
+
+
+def backfill_amenity_mask(apps, schema_editor):
+    Room = apps.get_model('rooms', 'Room')
+    mask = sum(
+        (Case(When(**{name: True}, then=Value(1 << bit)), default=Value(0), output_field=IntegerField())
+         for bit, name in enumerate(AMENITIES)),
+        Value(0),
+    )
+    bounds = Room.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    # One UPDATE per primary-key range keeps each statement's lock footprint small
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        Room.objects.filter(id__gte=start, id__lt=start + BATCH_SIZE).update(amenity_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0005_room_amenity_mask'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_amenity_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:28
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0006_backfill_room_amenity_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)]),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)]),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['is_available', 'geo_cell'], name='room_avail_geo_cell_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0007_room_geo_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_key', models.CharField(max_length=200)),
+                ('room_type', models.CharField(choices=[('1bhk', '1BHK Apartment'), ('2bhk', '2BHK Apartment'), ('3bhk', '3BHK Apartment'), ('pg', 'PG for Students'), ('shared', 'Shared Room'), ('studio', 'Studio Apartment')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('rent_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('sketch', models.JSONField(default=dict)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('location_key', 'room_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:43
+
+from django.db import migrations, models
+from django.db.models import Count
+import rooms.storage
+
+
+def count_existing_references(apps, schema_editor):
+    # Files stored so far are unique per row, but count them all the same
+    RoomImage = apps.get_model('rooms', 'RoomImage')
+    MediaBlob = apps.get_model('rooms', 'MediaBlob')
+    counts = RoomImage.objects.exclude(image='').values('image').annotate(n=Count('id')).order_by()
+    MediaBlob.objects.bulk_create(
+        (MediaBlob(name=row['image'], ref_count=row['n']) for row in counts.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0010_roomimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('content_hash', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='roomimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='roomimage',
+            name='image',
+            field=models.ImageField(storage=rooms.storage.room_image_storage, upload_to='room_images/'),
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
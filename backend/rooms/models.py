@@ -1,5 +1,35 @@
+import uuid
+
 from django.db import models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import JSONObject
 from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+from .geo import cell_for
+from .storage import digest_from_name, room_image_storage
+
+class RoomQuerySet(models.QuerySet):
+    def for_serializer(self):
+        """Fetch the owner and images that RoomSerializer nests, in a constant number of queries."""
+        return self.select_related('owner').prefetch_related('images')
+
+    def for_card(self):
+        """
+        Only the columns RoomCardSerializer shows, plus the first image's name,
+        processing status and thumbnail path as one correlated subquery
+        (`cover`, a dict), so a card list is a single query with no joins.
+        """
+        cover = RoomImage.objects.filter(room=OuterRef('pk')).order_by('uploaded_at', 'id').values(
+            cover=JSONObject(
+                image=F('image'),
+                status=F('processing_status'),
+                thumb=KeyTextTransform('jpeg', KeyTransform('thumb', 'variants')),
+            ),
+        )[:1]
+        return self.only(*Room.CARD_FIELDS).annotate(cover=Subquery(cover))
+
 
 class Room(models.Model):
     ROOM_TYPES = [
@@ -10,11 +40,20 @@ class Room(models.Model):
         ('shared', 'Shared Room'),
         ('studio', 'Studio Apartment'),
     ]
+    AMENITIES = ('wifi', 'ac', 'furnished', 'parking', 'laundry')
+    # Columns needed to render a listing card (see RoomQuerySet.for_card)
+    CARD_FIELDS = ('id', 'title', 'rent', 'location', 'room_type', *AMENITIES, 'is_available', 'created_at')
     
     title = models.CharField(max_length=200)
     description = models.TextField()
     rent = models.DecimalField(max_digits=10, decimal_places=2)
     location = models.CharField(max_length=200)
+    latitude = models.FloatField(null=True, blank=True,
+                                 validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True,
+                                  validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    # Grid cell of (latitude, longitude), see rooms.geo; kept in sync by save()
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False)
     room_type = models.CharField(max_length=20, choices=ROOM_TYPES)
     
     # Facilities
@@ -23,26 +62,226 @@ class Room(models.Model):
     furnished = models.BooleanField(default=False)
     parking = models.BooleanField(default=False)
     laundry = models.BooleanField(default=False)
+    # Packed copy of the facility flags (bit i = AMENITIES[i]), kept in sync by save()
+    amenity_mask = models.PositiveSmallIntegerField(default=0, editable=False)
     
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='rooms')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_available = models.BooleanField(default=True)
     
+    objects = RoomQuerySet.as_manager()
+    
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Keyset pagination: newest first, optionally narrowed by room type
+            models.Index(fields=['is_available', 'created_at', 'id'], name='room_avail_created_idx'),
+            models.Index(fields=['is_available', 'room_type', 'created_at', 'id'], name='room_avail_type_created_idx'),
+            # Keyset pagination / range filters on rent
+            models.Index(fields=['is_available', 'rent', 'id'], name='room_avail_rent_idx'),
+            models.Index(fields=['is_available', 'room_type', 'rent', 'id'], name='room_avail_type_rent_idx'),
+            # "Has all of these amenities" lookups
+            models.Index(fields=['is_available', 'amenity_mask', 'created_at', 'id'], name='room_avail_amenity_idx'),
+            # Radius / bounding-box pruning
+            models.Index(fields=['is_available', 'geo_cell'], name='room_avail_geo_cell_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - ₹{self.rent}"
 
+    @classmethod
+    def amenity_mask_for(cls, names):
+        mask = 0
+        for name in names:
+            mask |= 1 << cls.AMENITIES.index(name)
+        return mask
+
+    @classmethod
+    def amenities_q(cls, names):
+        """
+        Q for rooms having every amenity in `names`.
+
+        Expressed as `amenity_mask IN (<all supersets of the required bits>)`
+        so the lookup is a handful of index probes instead of a bitwise scan.
+        """
+        required = cls.amenity_mask_for(names)
+        if not required:
+            return models.Q()
+        supersets = [mask for mask in range(1 << len(cls.AMENITIES)) if mask & required == required]
+        return models.Q(amenity_mask__in=supersets)
+
+    def compute_amenity_mask(self):
+        return self.amenity_mask_for(name for name in self.AMENITIES if getattr(self, name))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the rent statistics currently count this room as (rooms.rent_stats)
+        instance._rent_stats_key = instance.rent_stats_key()
+        return instance
+
+    def rent_stats_key(self):
+        """(location key, room type, rent) this room contributes to rent statistics, if any."""
+        deferred = self.get_deferred_fields()
+        if {'location', 'room_type', 'rent', 'is_available'} & deferred or not self.is_available:
+            return None
+        return (RentStatistic.normalize_location(self.location), self.room_type, self.rent)
+
+    def sync_derived_fields(self):
+        """Recompute the denormalized columns; call before bulk_create, which skips save()."""
+        self.amenity_mask = self.compute_amenity_mask()
+        self.geo_cell = cell_for(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.sync_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if update_fields & set(self.AMENITIES):
+                update_fields.add('amenity_mask')
+            if update_fields & {'latitude', 'longitude'}:
+                update_fields.add('geo_cell')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        self._rent_stats_key = self.rent_stats_key()
+
+class RoomSearchTerm(models.Model):
+    """Posting in the room full-text inverted index, maintained by rooms.search."""
+    term = models.CharField(max_length=64)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        # Leading `term` serves query lookups; `room` makes the rank subquery index-only
+        unique_together = ('term', 'room')
+
+    def __str__(self):
+        return f"{self.term} ➜ {self.room_id}"
+
+class RentStatistic(models.Model):
+    """
+    Running rent summary of the available rooms for one (location, room type),
+    maintained incrementally by rooms.rent_stats.
+    """
+    location_key = models.CharField(max_length=200)
+    room_type = models.CharField(max_length=20, choices=Room.ROOM_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    rent_sum = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # Log-bucketed quantile sketch: {bucket index: count}
+    sketch = models.JSONField(default=dict)
+    # Counts per rooms.facets.RENT_BUCKETS bucket, in bucket order
+    histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('location_key', 'room_type')
+
+    def __str__(self):
+        return f"{self.location_key} / {self.room_type}: {self.count} rooms"
+
+    @staticmethod
+    def normalize_location(location):
+        return ' '.join((location or '').lower().split())[:200]
+
+class RoomImportCheckpoint(models.Model):
+    """
+    Progress of a resumable `import_rooms` job, committed in the same
+    transaction as each imported chunk so a resumed job never re-inserts rows.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    records_done = models.PositiveBigIntegerField(default=0)
+    inserted = models.PositiveBigIntegerField(default=0)
+    failed = models.PositiveBigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.records_done} records"
+
 class RoomImage(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    PROCESSING_STATUSES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='room_images/')
+    # Content-addressed: rows with identical bytes share one stored file (see rooms.blobs)
+    image = models.ImageField(upload_to='room_images/', storage=room_image_storage)
+    # SHA-256 of the file; blank only for files stored before deduplication
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Filled in by the background pipeline in rooms.images
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # {variant name: {'width', 'height', 'jpeg': path, 'webp': path}}
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    processing_status = models.CharField(max_length=10, choices=PROCESSING_STATUSES,
+                                         default=STATUS_PENDING, editable=False, db_index=True)
     
     def __str__(self):
         return f"Image for {self.room.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Blob the row referenced when loaded, so a replaced file can be released
+        instance._stored_image_name = instance.__dict__.get('image') or ''
+        return instance
+
+    def commit_image(self):
+        """
+        Write a newly assigned upload to storage now (normally pre_save does it)
+        and record its content hash. Bulk paths call this before bulk_create.
+        """
+        if self.image and not self.image._committed:
+            self.image.save(self.image.name, self.image.file, save=False)
+        if self.image:
+            self.content_hash = digest_from_name(self.image.name) or self.content_hash
+
+    def save(self, *args, **kwargs):
+        self.commit_image()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'image' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+        self._stored_image_name = self.image.name or ''
+
+class MediaBlob(models.Model):
+    """
+    Reference count of one stored room image file, maintained by rooms.blobs;
+    the file is deleted when the count drops to zero.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+
+class RoomImageUpload(models.Model):
+    """
+    A resumable upload session: chunks are appended to a temporary file
+    (rooms.uploads) until `received` reaches `size`, then finalized into a
+    RoomImage. Expired sessions are removed by `purge_upload_sessions`.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='image_uploads')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='image_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.filename}: {self.received}/{self.size} bytes"
 
 class WishlistItem(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='wishlist_items')
@@ -0,0 +1,148 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Room
+
+
+class RoomKeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over an indexed sort key with `id` as tie-breaker.
+
+    The cursor is an opaque base64 token holding the sort value and id of the
+    last row on the page, so every page is a single index range scan and page N
+    costs the same as page 1. Pagination is opt-in: it only kicks in when the
+    client sends `cursor` or `page_size`, otherwise the full list is returned
+    as before.
+    """
+
+    # sort key -> (model field or annotation, descending)
+    SORT_KEYS = {
+        'newest': ('created_at', True),
+        'rent_asc': ('rent', False),
+        'rent_desc': ('rent', True),
+        'relevance': ('search_rank', True),
+        'distance': ('distance', False),
+    }
+    # Types of the annotations above, used to decode cursor values
+    ANNOTATION_TYPES = {
+        'search_rank': int,
+        'distance': float,
+    }
+    # Sort keys that only exist when a query param is present, in default precedence
+    CONDITIONAL_SORTS = {
+        'relevance': 'q',
+        'distance': 'near',
+    }
+    default_sort = 'newest'
+    sort_query_param = 'sort'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+
+    def get_sort(self, request):
+        params = request.query_params
+        available = [sort for sort, param in self.CONDITIONAL_SORTS.items() if params.get(param)]
+        sort = params.get(self.sort_query_param) or next(iter(available), self.default_sort)
+        if sort not in self.SORT_KEYS:
+            raise ValidationError({self.sort_query_param: f"Must be one of: {', '.join(self.SORT_KEYS)}"})
+        if sort in self.CONDITIONAL_SORTS and sort not in available:
+            raise ValidationError({self.sort_query_param: f"'{sort}' requires '{self.CONDITIONAL_SORTS[sort]}'"})
+        return sort
+
+    def get_ordering(self, request):
+        field, descending = self.SORT_KEYS[self.get_sort(request)]
+        prefix = '-' if descending else ''
+        return [f'{prefix}{field}', f'{prefix}id']
+
+    def is_enabled(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, sort, value, pk):
+        # str() round-trips floats exactly, so distance ties compare equal again
+        payload = json.dumps({'s': sort, 'v': str(value), 'id': pk}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def parse_value(self, field, raw):
+        try:
+            return Room._meta.get_field(field).to_python(raw)
+        except FieldDoesNotExist:
+            return self.ANNOTATION_TYPES[field](raw)
+
+    def decode_cursor(self, sort, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            field, _ = self.SORT_KEYS[payload['s']]
+            value = self.parse_value(field, payload['v'])
+            pk = int(payload['id'])
+        except Exception:
+            raise NotFound('Invalid cursor')
+        if payload['s'] != sort or value is None:
+            # A cursor is only meaningful for the sort order that produced it
+            raise NotFound('Invalid cursor')
+        return value, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_enabled(request):
+            return None
+
+        self.request = request
+        self.sort = self.get_sort(request)
+        field, descending = self.SORT_KEYS[self.sort]
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.get_ordering(request))
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            value, pk = self.decode_cursor(self.sort, token)
+            op = 'lt' if descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+            )
+
+        # Fetch one extra row to learn whether another page exists
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        field, _ = self.SORT_KEYS[self.sort]
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.sort, getattr(last, field), last.pk))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
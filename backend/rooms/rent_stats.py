@@ -0,0 +1,159 @@
+"""
+Incrementally maintained rent statistics per (location, room type).
+
+Every RentStatistic row holds a count, a rent sum, fixed histogram buckets and
+a log-bucketed quantile sketch. The sketch maps a rent r to bucket
+ceil(log_gamma(r)); any quantile read from it is within RELATIVE_ACCURACY of
+the true value, and unlike sampling sketches it supports removals, so room
+updates and deletes are applied exactly. Reading statistics touches at most
+one row per room type, whatever the number of rooms.
+"""
+import math
+from decimal import Decimal
+
+from django.db import transaction
+
+from .facets import RENT_BUCKETS
+from .models import RentStatistic, Room
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+# Bucket for zero rents, below every positive bucket
+ZERO_BUCKET = -1000000
+
+QUANTILES = {'p25': 0.25, 'median': 0.5, 'p75': 0.75, 'p90': 0.9}
+
+
+def sketch_bucket(rent):
+    rent = float(rent)
+    if rent <= 0:
+        return ZERO_BUCKET
+    return math.ceil(math.log(rent) / _LOG_GAMMA)
+
+
+def sketch_value(bucket):
+    if bucket == ZERO_BUCKET:
+        return 0.0
+    # Midpoint (in relative terms) of (gamma^(i-1), gamma^i]
+    return 2 * GAMMA ** bucket / (GAMMA + 1)
+
+
+def histogram_bucket(rent):
+    index = 0
+    for i, lower in enumerate(RENT_BUCKETS):
+        if rent >= lower:
+            index = i
+    return index
+
+
+def _apply(stat, rent, delta):
+    stat.count += delta
+    stat.rent_sum += Decimal(rent) * delta
+
+    key = str(sketch_bucket(rent))  # JSON object keys are strings
+    remaining = stat.sketch.get(key, 0) + delta
+    if remaining > 0:
+        stat.sketch[key] = remaining
+    else:
+        stat.sketch.pop(key, None)
+
+    if len(stat.histogram) != len(RENT_BUCKETS):
+        stat.histogram = [0] * len(RENT_BUCKETS)
+    index = histogram_bucket(rent)
+    stat.histogram[index] = max(stat.histogram[index] + delta, 0)
+
+
+def record_many(stats_keys, delta=1):
+    """Add (delta=1) or remove (delta=-1) rooms, locking and writing each summary row once."""
+    rents = {}
+    for location_key, room_type, rent in stats_keys:
+        rents.setdefault((location_key, room_type), []).append(rent)
+
+    with transaction.atomic():
+        for (location_key, room_type), values in rents.items():
+            stat, _ = RentStatistic.objects.get_or_create(location_key=location_key, room_type=room_type)
+            # Row lock serializes concurrent read-modify-write of the JSON summaries
+            stat = RentStatistic.objects.select_for_update().get(pk=stat.pk)
+            for rent in values:
+                _apply(stat, rent, delta)
+            if stat.count <= 0:
+                # Removing rooms that were never counted (e.g. before a rebuild) must not go negative
+                stat.count, stat.rent_sum, stat.sketch, stat.histogram = 0, Decimal(0), {}, []
+            stat.save()
+
+
+def record(stats_key, delta):
+    """Add (delta=1) or remove (delta=-1) one room with `stats_key` from its summary."""
+    record_many([stats_key], delta)
+
+
+def room_changed(old_key, new_key):
+    """Move a room between summaries after a save or delete (keys from Room.rent_stats_key)."""
+    if old_key == new_key:
+        return
+    if old_key is not None:
+        record(old_key, -1)
+    if new_key is not None:
+        record(new_key, 1)
+
+
+def rebuild(batch_size=2000):
+    """Recompute every summary from the rooms table in one streaming pass."""
+    stats = {}
+    rooms = (Room.objects.filter(is_available=True)
+             .values_list('location', 'room_type', 'rent')
+             .order_by())
+    for location, room_type, rent in rooms.iterator(chunk_size=batch_size):
+        key = (RentStatistic.normalize_location(location), room_type)
+        stat = stats.get(key)
+        if stat is None:
+            stat = stats[key] = RentStatistic(location_key=key[0], room_type=room_type, sketch={}, histogram=[])
+        _apply(stat, rent, 1)
+
+    with transaction.atomic():
+        RentStatistic.objects.all().delete()
+        RentStatistic.objects.bulk_create(stats.values(), batch_size=batch_size)
+    return len(stats)
+
+
+def summarize(stats):
+    """Merge RentStatistic rows (e.g. all room types of a location) into one response dict."""
+    count = sum(stat.count for stat in stats)
+    rent_sum = sum((stat.rent_sum for stat in stats), Decimal(0))
+    sketch = {}
+    histogram = [0] * len(RENT_BUCKETS)
+    for stat in stats:
+        for bucket, n in stat.sketch.items():
+            sketch[int(bucket)] = sketch.get(int(bucket), 0) + n
+        for i, n in enumerate(stat.histogram[:len(histogram)]):
+            histogram[i] += n
+
+    result = {
+        'count': count,
+        'mean': round(rent_sum / count, 2) if count else None,
+    }
+    ordered = sorted(sketch.items())
+    for name, q in QUANTILES.items():
+        result[name] = _quantile(ordered, count, q)
+    result['histogram'] = [
+        {
+            'min': RENT_BUCKETS[i],
+            'max': RENT_BUCKETS[i + 1] if i + 1 < len(RENT_BUCKETS) else None,
+            'count': n,
+        }
+        for i, n in enumerate(histogram)
+    ]
+    return result
+
+
+def _quantile(ordered_buckets, count, q):
+    if not count:
+        return None
+    rank = q * (count - 1)
+    seen = 0
+    for bucket, n in ordered_buckets:
+        seen += n
+        if seen > rank:
+            return round(sketch_value(bucket), 2)
+    return round(sketch_value(ordered_buckets[-1][0]), 2)
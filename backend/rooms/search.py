@@ -0,0 +1,105 @@
+"""
+Inverted index for room full-text search.
+
+Each room is tokenized into (term, weight) postings stored in RoomSearchTerm.
+A query is answered from the postings of its terms alone, so its cost depends
+on how many rooms match rather than on the size of the rooms table. Postings
+are refreshed from the Room post_save signal (see rooms.signals) and removed
+by the foreign key cascade when a room is deleted.
+"""
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+
+from .models import RoomSearchTerm
+
+# Field -> weight applied to each occurrence of a term in that field
+FIELD_WEIGHTS = {
+    'title': 3,
+    'location': 2,
+    'description': 1,
+}
+SEARCH_FIELDS = tuple(FIELD_WEIGHTS)
+
+# Occurrences beyond this are ignored, so keyword stuffing cannot dominate ranking
+MAX_TERM_FREQUENCY = 10
+MAX_QUERY_TERMS = 10
+# Every distinct matched term outranks any amount of per-term weight
+TERM_MATCH_BONUS = 1000
+
+MAX_TERM_LENGTH = RoomSearchTerm._meta.get_field('term').max_length
+
+STOP_WORDS = frozenset("""
+    a an and are as at be by for from in is it near of on or the to with
+""".split())
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lower-case word tokens of `text`, without stop words or single characters."""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in _TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def build_postings(room):
+    """Return {term: weight} for a room (or any object with the search fields)."""
+    weights = Counter()
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for term, freq in Counter(tokenize(getattr(room, field))).items():
+            weights[term] += min(freq, MAX_TERM_FREQUENCY) * field_weight
+    return weights
+
+
+def index_rooms(rooms):
+    """Replace the postings of a batch of saved rooms in one delete and one insert."""
+    rooms = list(rooms)
+    with transaction.atomic():
+        RoomSearchTerm.objects.filter(room_id__in=[room.pk for room in rooms]).delete()
+        RoomSearchTerm.objects.bulk_create([
+            RoomSearchTerm(room_id=room.pk, term=term, weight=weight)
+            for room in rooms
+            for term, weight in build_postings(room).items()
+        ], batch_size=1000)
+
+
+def index_room(room):
+    """Replace the postings of a single room."""
+    index_rooms([room])
+
+
+def query_terms(query):
+    # Deduplicate while keeping order, then cap to bound the IN list
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def match(queryset, query):
+    """Narrow a Room queryset to rooms matching any term of `query`, without ranking."""
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+    return queryset.filter(id__in=RoomSearchTerm.objects.filter(term__in=terms).values('room_id'))
+
+
+def search(queryset, query):
+    """
+    Narrow a Room queryset to rooms matching any term of `query` and annotate
+    each with an integer `search_rank` (higher is better).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+
+    matches = RoomSearchTerm.objects.filter(term__in=terms)
+    rank = (
+        matches.filter(room=OuterRef('pk'))
+        .values('room')
+        .annotate(rank=Count('id') * TERM_MATCH_BONUS + Sum('weight'))
+        .values('rank')
+    )
+    return match(queryset, query).annotate(search_rank=Subquery(rank, output_field=IntegerField()))
@@ -1,11 +1,41 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import Room, RoomImage
+from .models import Room, RoomImage, RoomImageUpload
 from accounts.serializers import UserSerializer
 
 class RoomImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    
     class Meta:
         model = RoomImage
-        fields = ('id', 'image', 'uploaded_at')
+        fields = ('id', 'image', 'uploaded_at', 'width', 'height', 'processing_status', 'variants', 'srcset')
+        read_only_fields = ('width', 'height', 'processing_status')
+    
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    
+    def get_variants(self, obj):
+        # Empty until the background pipeline has processed the upload
+        return {
+            name: {
+                'width': entry['width'],
+                'height': entry['height'],
+                **{fmt: self._url(entry[fmt]) for fmt in ('jpeg', 'webp') if entry.get(fmt)},
+            }
+            for name, entry in (obj.variants or {}).items()
+        }
+    
+    def get_srcset(self, obj):
+        """Ready-made `srcset` attribute values per format, smallest variant first."""
+        entries = sorted((obj.variants or {}).values(), key=lambda entry: entry['width'])
+        return {
+            fmt: ', '.join(f"{self._url(entry[fmt])} {entry['width']}w" for entry in entries if entry.get(fmt))
+            for fmt in ('webp', 'jpeg')
+        } if entries else {}
 
 class RoomSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
@@ -13,17 +43,75 @@ class RoomSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Room
-        fields = ('id', 'title', 'description', 'rent', 'location', 'room_type', 
+        fields = ('id', 'title', 'description', 'rent', 'location', 'latitude', 'longitude', 'room_type', 
                  'wifi', 'ac', 'furnished', 'parking', 'laundry', 'owner', 
                  'created_at', 'updated_at', 'is_available', 'images')
         read_only_fields = ('id', 'owner', 'created_at', 'updated_at')
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Present only on near= searches
+        distance = getattr(instance, 'distance', None)
+        if distance is not None:
+            data['distance_km'] = round(distance, 3)
+        return data
+
+class RoomCardSerializer(serializers.ModelSerializer):
+    """Compact listing card; expects a queryset from RoomQuerySet.for_card()."""
+    cover_image = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Room
+        fields = ('id', 'title', 'rent', 'location', 'room_type',
+                 'wifi', 'ac', 'furnished', 'parking', 'laundry', 'is_available', 'cover_image')
+    
+    def get_cover_image(self, obj):
+        cover = obj.cover
+        if not cover:
+            return None
+        if cover['status'] == RoomImage.STATUS_READY and cover['thumb']:
+            # Variants are written to default storage by rooms.images
+            url = default_storage.url(cover['thumb'])
+        else:
+            # The annotation holds a bare name; resolve it with the field's own storage
+            url = RoomImage._meta.get_field('image').storage.url(cover['image'])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        distance = getattr(instance, 'distance', None)
+        if distance is not None:
+            data['distance_km'] = round(distance, 3)
+        return data
 
 class RoomCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Room
-        fields = ('title', 'description', 'rent', 'location', 'room_type', 
+        fields = ('title', 'description', 'rent', 'location', 'latitude', 'longitude', 'room_type', 
                  'wifi', 'ac', 'furnished', 'parking', 'laundry')
     
+    def validate(self, attrs):
+        latitude = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError('latitude and longitude must be provided together')
+        return attrs
+    
     def create(self, validated_data):
         validated_data['owner'] = self.context['request'].user
         return super().create(validated_data)
+
+class RoomImageUploadSerializer(serializers.ModelSerializer):
+    """A resumable upload session; `offset` is where the next chunk must start."""
+    offset = serializers.IntegerField(source='received', read_only=True)
+    
+    class Meta:
+        model = RoomImageUpload
+        fields = ('id', 'room', 'filename', 'size', 'offset', 'expires_at')
+        read_only_fields = ('id', 'room', 'expires_at')
+    
+    def validate_size(self, value):
+        if not 0 < value <= settings.ROOM_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Must be between 1 and {settings.ROOM_UPLOAD_MAX_SIZE} bytes.')
+        return value
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Room, RoomImage
+from . import blobs
+from . import cache
+from . import images
+from . import rent_stats
+from . import search
+
+
+@receiver(post_save, sender=Room)
+def update_room_search_index(sender, instance, update_fields=None, **kwargs):
+    # Skip saves that cannot have changed any searchable text
+    if update_fields is not None and not set(update_fields) & set(search.SEARCH_FIELDS):
+        return
+    search.index_room(instance)
+
+
+@receiver(post_save, sender=Room)
+def update_rent_statistics(sender, instance, **kwargs):
+    rent_stats.room_changed(getattr(instance, '_rent_stats_key', None), instance.rent_stats_key())
+
+
+@receiver(post_delete, sender=Room)
+def remove_from_rent_statistics(sender, instance, **kwargs):
+    # Rooms loaded from the database remember the summary they were counted in
+    old_key = instance._rent_stats_key if hasattr(instance, '_rent_stats_key') else instance.rent_stats_key()
+    rent_stats.room_changed(old_key, None)
+
+
+@receiver(post_save, sender=RoomImage)
+def process_new_room_image(sender, instance, created, **kwargs):
+    # Variants are produced off the request; the pipeline's own saves keep the file
+    if created or instance.image.name != getattr(instance, '_stored_image_name', instance.image.name):
+        images.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=RoomImage)
+def count_room_image_reference(sender, instance, created, **kwargs):
+    old_name = getattr(instance, '_stored_image_name', '')
+    if instance.image.name == old_name and not created:
+        return
+    blobs.acquire(instance.image.name)
+    if not created:
+        # The file was replaced
+        blobs.release(old_name)
+
+
+@receiver(post_delete, sender=RoomImage)
+def release_room_image_file(sender, instance, **kwargs):
+    # The file and shared variants go with the last reference; private variants go now
+    transaction.on_commit(lambda: images.delete_variants(instance))
+    blobs.release(instance.image.name, on_delete=lambda: images.delete_variants(instance, shared=True))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=RoomImage)
+@receiver(post_delete, sender=RoomImage)
+def invalidate_room_responses(sender, **kwargs):
+    # After commit, so a concurrent request cannot cache pre-commit rows under the new version
+    transaction.on_commit(cache.bump_version)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_room_responses_for_owner(sender, instance, update_fields=None, **kwargs):
+    # Room responses embed the owner's profile; logins only touch last_login
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(cache.bump_version)
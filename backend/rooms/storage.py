@@ -0,0 +1,69 @@
+"""
+Content-addressed storage for room image files.
+
+Files are stored as `<upload_to>/<first two hex digits>/<sha256><ext>`, so
+identical uploads share one blob: saving bytes that are already stored writes
+nothing and returns the existing name. Because a blob may back many RoomImage
+rows, deleting a row never removes the file directly; rooms.blobs keeps a
+reference count per name and deletes the file once nothing points at it.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+DIGEST_PATTERN = re.compile(r'^([0-9a-f]{64})(?:_|$)')
+
+
+def file_digest(content):
+    """SHA-256 of a file-like object, read in chunks; the file position is restored to the start."""
+    if not hasattr(content, 'chunks'):
+        content = File(content)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def digest_from_name(name):
+    """The content hash encoded in a stored name, or '' for names not written by this storage."""
+    stem = os.path.splitext(posixpath.basename(name or ''))[0]
+    match = DIGEST_PATTERN.match(stem)
+    return match.group(1) if match else ''
+
+
+def hashed_name(name, digest):
+    directory, filename = posixpath.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None, digest=None):
+        """Store `content` under its hash; pass `digest` when the caller already computed it."""
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, digest or file_digest(content))
+        if self.exists(name):
+            # Identical bytes are already stored
+            return name
+        # A concurrent writer of the same bytes may still win the race; the
+        # loser gets a suffixed copy, which digest_from_name still recognizes
+        return super().save(name, content, max_length=max_length)
+
+
+_room_image_storage = ContentAddressedStorage()
+
+
+def room_image_storage():
+    """Storage callable for RoomImage.image (keeps the instance out of migrations)."""
+    return _room_image_storage
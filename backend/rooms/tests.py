@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import Room, RoomImage, WishlistItem
+from . import cache
+
+User = get_user_model()
+
+# Rooms in the fixture; budgets must not depend on it, so an N+1 regression
+# shows up as an overrun
+FIXTURE_ROOMS = 30
+IMAGES_PER_ROOM = 3
+
+# Throwaway response cache, so no test touches the configured backend
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'room_responses': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-rooms'},
+}
+
+
+class QueryBudgetTestCase(TestCase):
+    """Asserts a maximum number of SQL queries per endpoint, on a cold response cache."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def assertQueryBudget(self, url, budget, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertLessEqual(len(ctx.captured_queries), budget,
+                             f'{url} used {len(ctx.captured_queries)} queries (budget {budget})')
+
+
+@override_settings(CACHES=TEST_CACHES, ROOM_RESPONSE_CACHE_ALIAS='room_responses')
+class RoomQueryBudgetTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='owner', password=None, role='owner')
+        Room.objects.bulk_create([
+            Room(title=f'Budget room {i}', description='Fixture', rent=1000 + i,
+                 location='Budget City', room_type='1bhk', owner=cls.owner)
+            for i in range(FIXTURE_ROOMS)
+        ])
+        cls.rooms = list(Room.objects.filter(owner=cls.owner))
+        RoomImage.objects.bulk_create([
+            RoomImage(room=room, image=f'room_images/budget_{room.id}_{n}.jpg')
+            for room in cls.rooms for n in range(IMAGES_PER_ROOM)
+        ])
+        WishlistItem.objects.bulk_create([WishlistItem(user=cls.owner, room=room) for room in cls.rooms])
+
+    def test_room_list(self):
+        self.assertQueryBudget('/api/rooms/', 2)
+
+    def test_room_list_paginated(self):
+        self.assertQueryBudget('/api/rooms/?page_size=20', 2)
+
+    def test_room_list_cards(self):
+        self.assertQueryBudget('/api/rooms/?view=card', 1)
+
+    def test_room_facets(self):
+        self.assertQueryBudget('/api/rooms/facets/', 1)
+
+    def test_room_detail(self):
+        self.assertQueryBudget(f'/api/rooms/{self.rooms[0].id}/', 2)
+
+    def test_user_rooms(self):
+        self.assertQueryBudget('/api/rooms/my-rooms/', 2, user=self.owner)
+
+    def test_user_rooms_cards(self):
+        self.assertQueryBudget('/api/rooms/my-rooms/?view=card', 1, user=self.owner)
+
+    def test_wishlist(self):
+        self.assertQueryBudget('/api/wishlist/', 2, user=self.owner)
+
+    def test_wishlist_cards(self):
+        self.assertQueryBudget('/api/wishlist/?view=card', 1, user=self.owner)
@@ -0,0 +1,187 @@
+"""
+Resumable, chunked uploads of room images.
+
+A session records the expected size and how many bytes have been received.
+Each chunk is written at the session's current offset, so a client that lost
+its connection asks for the offset and continues from there; earlier chunks
+are never read again until the finished file is finalized into a RoomImage.
+
+Writing a chunk holds no transaction or row lock while the body arrives, which
+on a slow link can take minutes. A writer claims the session with a
+non-blocking lock on its partial file (a concurrent retry gets 409 rather than
+waiting), and records the new offset with an UPDATE conditional on the offset
+it started from.
+"""
+import fcntl
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RoomImageUpload
+from . import images
+
+CHUNK_SIZE = 64 * 1024
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    """A chunk or finalize request the session cannot accept; `status` is the HTTP status."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        # Where the client should resume, when that is known
+        self.offset = offset
+
+
+def part_path(session_id):
+    return os.path.join(settings.ROOM_UPLOAD_SESSION_DIR, f'{session_id}.part')
+
+
+def create_session(owner, room, filename, size):
+    os.makedirs(settings.ROOM_UPLOAD_SESSION_DIR, exist_ok=True)
+    session = RoomImageUpload.objects.create(
+        owner=owner, room=room, filename=os.path.basename(filename)[:255] or 'upload', size=size,
+        expires_at=timezone.now() + settings.ROOM_UPLOAD_SESSION_TTL,
+    )
+    open(part_path(session.pk), 'wb').close()
+    return session
+
+
+def active_sessions(owner):
+    return RoomImageUpload.objects.filter(owner=owner, expires_at__gt=timezone.now())
+
+
+def parse_content_range(header):
+    match = CONTENT_RANGE_PATTERN.match((header or '').strip())
+    if not match:
+        raise UploadError('Content-Range must be "bytes <start>-<end>/<size>"')
+    start, end, total = (int(value) for value in match.groups())
+    if end < start:
+        raise UploadError('Content-Range end precedes its start')
+    return start, end, total
+
+
+def write_chunk(owner, session_id, content_range, stream, content_length):
+    """Append the request body at the offset named by its Content-Range; returns the session."""
+    start, end, total = parse_content_range(content_range)
+    session = _chunk_session(owner, session_id, start, end, total, content_length)
+    try:
+        handle = open(part_path(session.pk), 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Upload session not found or expired', status=404)
+    with handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another chunk of this upload is being written', status=409, offset=session.received)
+        # The previous holder may have moved the offset after we read it
+        session = _chunk_session(owner, session_id, start, end, total, content_length)
+
+        written = 0
+        handle.seek(start)
+        while written < content_length:
+            try:
+                chunk = stream.read(min(CHUNK_SIZE, content_length - written))
+            except OSError:
+                # Client went away (UnreadablePostError); keep what arrived
+                break
+            if not chunk:
+                break
+            handle.write(chunk)
+            written += len(chunk)
+        # Drop any tail left by an earlier, interrupted chunk
+        handle.truncate()
+        handle.flush()
+
+        # Recorded even for a short chunk, so the client resumes mid-chunk.
+        # No row matches if the session expired, was aborted or moved on meanwhile
+        session.received = start + written
+        session.expires_at = timezone.now() + settings.ROOM_UPLOAD_SESSION_TTL
+        updated = active_sessions(owner).filter(pk=session.pk, received=start).update(
+            received=session.received, expires_at=session.expires_at,
+        )
+    if not updated:
+        raise UploadError('Upload session not found or expired', status=404)
+
+    if written != content_length:
+        raise UploadError(f'Chunk ended after {written} bytes', offset=session.received)
+    return session
+
+
+def _chunk_session(owner, session_id, start, end, total, content_length):
+    """The session a chunk is for, after checking the chunk fits at its current offset."""
+    session = active_sessions(owner).filter(pk=session_id).first()
+    if session is None:
+        raise UploadError('Upload session not found or expired', status=404)
+    if total != session.size or end >= session.size:
+        raise UploadError(f'Content-Range does not match the session size of {session.size} bytes')
+    if start != session.received:
+        # Conflict tells the client where to resume
+        raise UploadError(f'Expected offset {session.received}', status=409, offset=session.received)
+    if content_length != end - start + 1:
+        raise UploadError('Content-Length does not match Content-Range')
+    return session
+
+
+def finalize(owner, session_id, validate):
+    """
+    Turn a complete session into a RoomImage of its room. `validate` checks the
+    assembled file (raising ValidationError) before it is stored.
+    """
+    with transaction.atomic():
+        session = active_sessions(owner).select_for_update().select_related('room').filter(pk=session_id).first()
+        if session is None:
+            raise UploadError('Upload session not found or expired', status=404)
+        if session.room.owner_id != owner.pk:
+            raise UploadError('Room not found', status=404)
+        if session.received != session.size:
+            raise UploadError('Upload incomplete', status=409, offset=session.received)
+
+        with open(part_path(session.pk), 'rb') as handle:
+            upload = File(handle, name=session.filename)
+            validate(upload)
+            upload.seek(0)
+            image, = images.attach_uploads(session.room, [upload])
+        session.delete()
+    discard(session_id)
+    return image
+
+
+def abort(owner, session_id):
+    deleted, _ = RoomImageUpload.objects.filter(owner=owner, pk=session_id).delete()
+    discard(session_id)
+    return bool(deleted)
+
+
+def discard(session_id):
+    try:
+        os.remove(part_path(session_id))
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired(now=None):
+    """Delete expired sessions and partial files no session owns; returns (sessions, files) removed."""
+    now = now or timezone.now()
+    expired = list(RoomImageUpload.objects.filter(expires_at__lte=now).values_list('pk', flat=True))
+    RoomImageUpload.objects.filter(pk__in=expired).delete()
+    for session_id in expired:
+        discard(session_id)
+
+    orphans = 0
+    directory = settings.ROOM_UPLOAD_SESSION_DIR
+    if os.path.isdir(directory):
+        live = {str(pk) for pk in RoomImageUpload.objects.values_list('pk', flat=True)}
+        cutoff = (now - settings.ROOM_UPLOAD_SESSION_TTL).timestamp()
+        for entry in os.scandir(directory):
+            session_id = entry.name[:-len('.part')] if entry.name.endswith('.part') else None
+            # Files of deleted rooms or crashed creates; recent ones may belong to a session being created
+            if session_id not in live and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                orphans += 1
+    return len(expired), orphans
@@ -4,10 +4,17 @@ from django.urls import include
 
 urlpatterns = [
     path('', views.RoomListView.as_view(), name='room-list'),
+    path('facets/', views.room_facets, name='room-facets'),
+    path('rent-stats/', views.rent_statistics, name='rent-statistics'),
+    path('image-backlog/', views.image_backlog, name='image-backlog'),
     path('<int:pk>/', views.RoomDetailView.as_view(), name='room-detail'),
     path('create/', views.RoomCreateView.as_view(), name='room-create'),
     path('my-rooms/', views.UserRoomsView.as_view(), name='user-rooms'),
     path('<int:pk>/update/', views.RoomUpdateView.as_view(), name='room-update'),
     path('<int:pk>/delete/', views.RoomDeleteView.as_view(), name='room-delete'),
     path('<int:room_id>/upload-image/', views.upload_room_image, name='upload-room-image'),
+    path('<int:room_id>/upload-images/', views.upload_room_images, name='upload-room-images'),
+    path('<int:room_id>/uploads/', views.create_image_upload, name='create-image-upload'),
+    path('uploads/<uuid:session_id>/', views.image_upload_detail, name='image-upload-detail'),
+    path('uploads/<uuid:session_id>/finalize/', views.finalize_image_upload, name='finalize-image-upload'),
 ]
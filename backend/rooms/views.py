@@ -1,38 +1,110 @@
-from rest_framework import generics, status
+import io
+
+from rest_framework import generics, serializers, status
 from rest_framework.decorators import api_view, permission_classes, parser_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
 from django.db.models import Q
-from .models import Room, RoomImage, WishlistItem
-from .serializers import RoomSerializer, RoomCreateSerializer, RoomImageSerializer
+from .models import Room, RoomImage, WishlistItem, RentStatistic
+from .serializers import (RoomSerializer, RoomCardSerializer, RoomCreateSerializer, RoomImageSerializer,
+                          RoomImageUploadSerializer)
+from .pagination import RoomKeysetPagination
+from .filters import room_filters
+from .facets import room_facet_counts
+from . import search
+from . import geo
+from . import images
+from . import rent_stats
+from . import uploads
+from .cache import VersionedResponseCacheMixin
 
-class RoomListView(generics.ListAPIView):
-    serializer_class = RoomSerializer
+def wants_cards(request):
+    """True for `view=card`, the compact listing representation."""
+    view = request.query_params.get('view', None) or 'full'
+    if view not in ('full', 'card'):
+        raise ValidationError({'view': "Must be 'full' or 'card'"})
+    return view == 'card'
+
+def room_list_queryset(request):
+    """Rooms shaped for the representation the request asked for."""
+    if wants_cards(request):
+        return Room.objects.for_card()
+    return Room.objects.for_serializer()
+
+def room_list_serializer_class(request):
+    return RoomCardSerializer if wants_cards(request) else RoomSerializer
+
+class RoomRepresentationMixin:
+    """Lets list views answer `view=card` with RoomCardSerializer."""
+    
+    def get_serializer_class(self):
+        return room_list_serializer_class(self.request)
+
+class RoomListView(VersionedResponseCacheMixin, RoomRepresentationMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
+    pagination_class = RoomKeysetPagination
     
     def get_queryset(self):
-        queryset = Room.objects.filter(is_available=True)
+        queryset = room_list_queryset(self.request).filter(is_available=True)
         
         # Search filters
-        location = self.request.query_params.get('location', None)
-        min_rent = self.request.query_params.get('min_rent', None)
-        max_rent = self.request.query_params.get('max_rent', None)
-        room_type = self.request.query_params.get('room_type', None)
-        
-        if location:
-            queryset = queryset.filter(location__icontains=location)
-        if min_rent:
-            queryset = queryset.filter(rent__gte=min_rent)
-        if max_rent:
-            queryset = queryset.filter(rent__lte=max_rent)
-        if room_type:
-            queryset = queryset.filter(room_type=room_type)
+        q = self.request.query_params.get('q', None)
+        near = geo.parse_near(self.request.query_params)
+        queryset = queryset.filter(*room_filters(self.request.query_params).values())
+        if q:
+            # Ranked full-text match over title, description and location
+            queryset = search.search(queryset, q)
+        if near:
+            # near=lat,lng&radius=km, annotates `distance`
+            queryset = geo.near(queryset, *near)
             
-        return queryset
+        # sort=newest|rent_asc|rent_desc|relevance|distance, always tie-broken on id
+        return queryset.order_by(*self.paginator.get_ordering(self.request))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def room_facets(request):
+    """Facet counts for the current RoomListView filter set, in one aggregate query."""
+    queryset = Room.objects.filter(is_available=True)
+    q = request.query_params.get('q', None)
+    near = geo.parse_near(request.query_params)
+    if q:
+        queryset = search.match(queryset, q)
+    if near:
+        queryset = geo.near(queryset, *near)
+    return Response(room_facet_counts(queryset, room_filters(request.query_params)))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def rent_statistics(request):
+    """Precomputed rent summary for a location, optionally narrowed to one room type."""
+    location = request.query_params.get('location', '')
+    room_type = request.query_params.get('room_type', None)
+    location_key = RentStatistic.normalize_location(location)
+    if not location_key:
+        return Response({'error': 'location is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-class RoomDetailView(generics.RetrieveAPIView):
-    queryset = Room.objects.all()
+    stats = RentStatistic.objects.filter(location_key=location_key)
+    if room_type:
+        stats = stats.filter(room_type=room_type)
+    return Response({
+        'location': location_key,
+        'room_type': room_type,
+        **rent_stats.summarize(list(stats)),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def image_backlog(request):
+    """Image processing backlog as seen by the worker serving this request, including its in-process queue."""
+    return Response(images.backlog())
+
+class RoomDetailView(VersionedResponseCacheMixin, generics.RetrieveAPIView):
+    queryset = Room.objects.for_serializer()
     serializer_class = RoomSerializer
     permission_classes = [AllowAny]
 
@@ -40,12 +112,11 @@ class RoomCreateView(generics.CreateAPIView):
     serializer_class = RoomCreateSerializer
     permission_classes = [IsAuthenticated]
 
-class UserRoomsView(generics.ListAPIView):
-    serializer_class = RoomSerializer
+class UserRoomsView(RoomRepresentationMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Room.objects.filter(owner=self.request.user)
+        return room_list_queryset(self.request).filter(owner=self.request.user)
 
 class RoomUpdateView(generics.UpdateAPIView):
     serializer_class = RoomCreateSerializer
@@ -71,12 +142,127 @@ def upload_room_image(request, room_id):
     
     serializer = RoomImageSerializer(data=request.data)
     if serializer.is_valid():
-        instance = serializer.save(room=room)
+        # Thumbnails and WebP variants are produced in the background (rooms.images);
+        # the response reports processing_status='pending' until they exist
+        instance, = images.attach_uploads(room, [serializer.validated_data['image']])
         # Re-serialize with context so URL (if needed) can be absolute
         out = RoomImageSerializer(instance, context={'request': request}).data
         return Response(out, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# Files accepted by one batch upload request
+MAX_BATCH_IMAGES = 20
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def upload_room_images(request, room_id):
+    """
+    Upload many images (repeated `images` form field) in one request. Valid
+    files are stored and inserted together; the response lists one result per
+    file in request order.
+    """
+    # Spool every file to a temporary file instead of holding small ones in memory
+    request._request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+    try:
+        room = Room.objects.get(id=room_id, owner=request.user)
+    except Room.DoesNotExist:
+        return Response({'error': 'Room not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    files = request.FILES.getlist('images')
+    if not files:
+        return Response({'images': ['No files were submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+    if len(files) > MAX_BATCH_IMAGES:
+        return Response({'images': [f'At most {MAX_BATCH_IMAGES} files per request.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    # One field validates every file (Pillow checks it really is an image)
+    field = serializers.ImageField()
+    results = []
+    valid = []
+    for upload in files:
+        try:
+            field.run_validation(upload)
+        except ValidationError as exc:
+            results.append({'name': upload.name, 'status': 'error', 'errors': exc.detail})
+            continue
+        except DjangoValidationError as exc:
+            # Pillow's check comes from Django's form field and is not translated by DRF here
+            results.append({'name': upload.name, 'status': 'error', 'errors': exc.messages})
+            continue
+        results.append({'name': upload.name, 'status': 'created'})
+        valid.append((results[-1], upload))
+    
+    created = images.attach_uploads(room, [upload for _, upload in valid])
+    for (result, _), image in zip(valid, created):
+        result['image'] = RoomImageSerializer(image, context={'request': request}).data
+    
+    response_status = status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+    return Response({'results': results}, status=response_status)
+
+
+def upload_error_response(exc):
+    data = {'error': str(exc)}
+    if exc.offset is not None:
+        data['offset'] = exc.offset
+    return Response(data, status=exc.status)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_image_upload(request, room_id):
+    """Start a resumable upload of one image of `room_id`: {"filename", "size"}."""
+    try:
+        room = Room.objects.get(id=room_id, owner=request.user)
+    except Room.DoesNotExist:
+        return Response({'error': 'Room not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    serializer = RoomImageUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    session = uploads.create_session(request.user, room, serializer.validated_data['filename'],
+                                     serializer.validated_data['size'])
+    return Response(RoomImageUploadSerializer(session).data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def image_upload_detail(request, session_id):
+    """
+    GET reports the offset to resume from. PUT appends the raw request body,
+    described by `Content-Range: bytes <start>-<end>/<size>`, at that offset.
+    DELETE abandons the upload.
+    """
+    if request.method == 'DELETE':
+        if not uploads.abort(request.user, session_id):
+            return Response({'error': 'Upload session not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    if request.method == 'PUT':
+        try:
+            session = uploads.write_chunk(
+                request.user, session_id, request.headers.get('Content-Range'),
+                request.stream or io.BytesIO(), int(request.META.get('CONTENT_LENGTH') or 0),
+            )
+        except uploads.UploadError as exc:
+            return upload_error_response(exc)
+    else:
+        session = uploads.active_sessions(request.user).filter(pk=session_id).first()
+        if session is None:
+            return Response({'error': 'Upload session not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(RoomImageUploadSerializer(session).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_image_upload(request, session_id):
+    """Attach a completely received upload to its room as a RoomImage."""
+    try:
+        image = uploads.finalize(request.user, session_id, serializers.ImageField().run_validation)
+    except uploads.UploadError as exc:
+        return upload_error_response(exc)
+    except (ValidationError, DjangoValidationError) as exc:
+        # Not an image; resuming cannot fix that
+        uploads.abort(request.user, session_id)
+        errors = exc.detail if isinstance(exc, ValidationError) else exc.messages
+        return Response({'image': errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(RoomImageSerializer(image, context={'request': request}).data, status=status.HTTP_201_CREATED)
 
 # =========================
 # Wishlist API Endpoints
@@ -88,8 +274,8 @@ def upload_room_image(request, room_id):
 def wishlist_list(request):
     """Return the authenticated user's wishlist rooms."""
     room_ids = WishlistItem.objects.filter(user=request.user).values_list('room_id', flat=True)
-    rooms = Room.objects.filter(id__in=room_ids)
-    serializer = RoomSerializer(rooms, many=True, context={'request': request})
+    rooms = room_list_queryset(request).filter(id__in=room_ids)
+    serializer = room_list_serializer_class(request)(rooms, many=True, context={'request': request})
     return Response(serializer.data)
 
 
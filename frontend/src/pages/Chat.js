@@ -14,8 +14,11 @@ const Chat = () => {
   const [newMessage, setNewMessage] = useState('');
   const [editingMessageId, setEditingMessageId] = useState(null);
   const [editText, setEditText] = useState('');
+  const [presence, setPresence] = useState({ online: [], typing: [] });
   const wsRef = useRef(null);
   const currentRoomIdRef = useRef(null);
+  const heartbeatRef = useRef(null);
+  const lastTypingSentRef = useRef(0);
   const messagesEndRef = useRef(null);
 
   const targetUserId = searchParams.get('user');
@@ -43,8 +46,9 @@ const Chat = () => {
   // Stable helpers first so they can be safely referenced below
   const fetchMessages = useCallback(async (roomId, autoMarkRead = false) => {
     try {
+      // Latest page only; older messages are behind response.data.next
       const response = await axios.get(`${config.apiBaseUrl}/chat/messages/${roomId}/`);
-      const list = response.data || [];
+      const list = response.data.results || [];
       setMessages(list);
       if (autoMarkRead) {
         const latestUnread = [...list].reverse().find(m => m.sender.id !== user.id && !m.is_read);
@@ -52,7 +56,7 @@ const Chat = () => {
           setTimeout(() => {
             try {
               if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
-                wsRef.current.send(JSON.stringify({ action: 'read', message_id: latestUnread.id }));
+                wsRef.current.send(JSON.stringify({ action: 'read_up_to', message_id: latestUnread.id }));
               }
             } catch (_) {}
           }, 0);
@@ -69,6 +73,8 @@ const Chat = () => {
     }
 
     currentRoomIdRef.current = roomId;
+    clearInterval(heartbeatRef.current);
+    setPresence({ online: [], typing: [] });
 
     const token = localStorage.getItem('access_token');
     const wsUrl = `${config.wsBaseUrl}/chat/${roomId}/?token=${encodeURIComponent(token || '')}`;
@@ -77,6 +83,12 @@ const Chat = () => {
     websocket.onopen = () => {
       wsRef.current = websocket;
       console.log('WebSocket connected');
+      // Keeps us online; the server forgets silent connections after 30s
+      heartbeatRef.current = setInterval(() => {
+        if (websocket.readyState === WebSocket.OPEN) {
+          websocket.send(JSON.stringify({ action: 'heartbeat' }));
+        }
+      }, 15000);
     };
 
     websocket.onmessage = (event) => {
@@ -95,6 +107,25 @@ const Chat = () => {
         return;
       }
 
+      if (data.event === 'rejected') {
+        // Our edit/delete didn't apply (not ours, already deleted, or never stored)
+        console.warn(`Chat ${data.action} rejected for message`, data.message_id);
+        return;
+      }
+
+      if (data.event === 'read_up_to') {
+        // Ids aren't in send order across servers; compare (timestamp, id) like the server does
+        const upToTime = Date.parse(data.up_to_timestamp);
+        const atOrBefore = (m) => {
+          const time = Date.parse(m.timestamp);
+          return time < upToTime || (time === upToTime && m.id <= data.up_to);
+        };
+        setMessages(prev => prev.map(m =>
+          m.sender.id !== data.reader_id && atOrBefore(m) ? { ...m, is_read: true } : m
+        ));
+        return;
+      }
+
       if (data.event === 'read') {
         setMessages(prev => prev.map(m =>
           m.id === data.message_id ? { ...m, is_read: true } : m
@@ -102,6 +133,23 @@ const Chat = () => {
         return;
       }
 
+      if (data.event === 'presence') {
+        setPresence(prev => ({
+          online: [...prev.online.filter(id => !data.offline.includes(id) && !data.online.includes(id)), ...data.online],
+          typing: [...prev.typing.filter(id => !data.not_typing.includes(id) && !data.typing.includes(id)), ...data.typing],
+        }));
+        return;
+      }
+
+      // Write-behind servers confirm storage separately from the broadcast
+      if (data.event === 'ack' || data.event === 'persist_failed') {
+        const failed = data.event === 'persist_failed';
+        setMessages(prev => prev.map(m =>
+          data.message_ids.includes(m.id) ? { ...m, failed } : m
+        ));
+        return;
+      }
+
       if (data.sender_id === user.id) {
         setMessages(prev => {
           const copy = [...prev];
@@ -141,6 +189,7 @@ const Chat = () => {
 
     websocket.onclose = () => {
       console.log('WebSocket disconnected');
+      clearInterval(heartbeatRef.current);
       const targetId = currentRoomIdRef.current;
       if (targetId === roomId) {
         setTimeout(() => {
@@ -232,6 +281,18 @@ const Chat = () => {
     ));
 
     setNewMessage('');
+    lastTypingSentRef.current = 0;
+  };
+
+  const handleMessageChange = (e) => {
+    setNewMessage(e.target.value);
+    // The server coalesces these too; no need to send one per keystroke
+    const now = Date.now();
+    if (e.target.value && now - lastTypingSentRef.current > 2000
+        && wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+      lastTypingSentRef.current = now;
+      wsRef.current.send(JSON.stringify({ action: 'typing' }));
+    }
   };
 
   // Edit/Delete helpers
@@ -266,6 +327,10 @@ const Chat = () => {
 
   const renderStatus = (m) => {
     if (m.sender.id !== user.id) return null;
+    // not stored by the server
+    if (m.failed) {
+      return <span className="ml-1 text-xs text-red-400">!</span>;
+    }
     // seen
     if (m.is_read) {
       return <span className="ml-1 text-xs text-blue-400">✓✓</span>;
@@ -287,6 +352,7 @@ const Chat = () => {
   // Cleanup on unmount
   useEffect(() => {
     return () => {
+      clearInterval(heartbeatRef.current);
       if (wsRef.current) {
         try { wsRef.current.close(); } catch (_) {}
         wsRef.current = null;
@@ -364,6 +430,15 @@ const Chat = () => {
                             : otherParticipant?.username;
                         })()}
                       </p>
+                      {(() => {
+                        const otherId = selectedRoom.participants.find(p => p.id !== user.id)?.id;
+                        if (presence.typing.includes(otherId)) {
+                          return <p className="text-xs text-primary-600">typing…</p>;
+                        }
+                        return presence.online.includes(otherId)
+                          ? <p className="text-xs text-green-600">online</p>
+                          : null;
+                      })()}
                     </div>
                   </div>
                 </div>
@@ -428,7 +503,7 @@ const Chat = () => {
                     <input
                       type="text"
                       value={newMessage}
-                      onChange={(e) => setNewMessage(e.target.value)}
+                      onChange={handleMessageChange}
                       placeholder="Type your message..."
                       className="flex-1 px-3 py-2 border border-gray-300 rounded-md focus:ring-2 focus:ring-primary-500 focus:border-transparent"
                     />